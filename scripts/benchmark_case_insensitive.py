@@ -0,0 +1,98 @@
+import argparse
+import random
+import sys
+import time
+import timeit
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from utils import json_utils  # noqa: E402
+
+WRAPPERS = {
+    'CaseInsensitiveDict': json_utils.wrap_case_insensitive,
+    'CaseInsensitiveView': json_utils.CaseInsensitiveView,
+}
+
+
+def build_abilities(count):
+    """Build a synthetic tree shaped like abilities.json"""
+    abilities = {}
+    for i in range(count):
+        abilities[f'ability_{i}'] = {
+            '_class': f'citadel_ability_{i}',
+            'm_eAbilityType': 'EAbilityType_Signature',
+            'm_mapAbilityProperties': {
+                f'Property{j}': {
+                    'm_strValue': str(j),
+                    'm_strCSSClass': 'cooldown',
+                    'm_subclassScaleFunction': {'_class': 'scale_function_single_stat', 'm_flStatScale': 0.2},
+                }
+                for j in range(20)
+            },
+            'm_vecAbilityUpgrades': [{'m_vecPropertyUpgrades': [{'m_strPropertyName': 'Property0', 'm_strBonus': '1'}]} for _ in range(3)],
+        }
+    return abilities
+
+
+def measure_memory(wrap, raw, touch):
+    """Peak memory to wrap the tree, then access every node if touch is set"""
+    tracemalloc.start()
+    wrapped = wrap(raw)
+    if touch:
+        walk(wrapped)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def walk(node):
+    if isinstance(node, dict):
+        for key in node:
+            walk(node[key])
+    elif isinstance(node, list):
+        for item in node:
+            walk(item)
+
+
+def lookups(wrapped, keys):
+    """Look up a stat of every given ability, as a parser would"""
+    for key in keys:
+        wrapped[key]['m_mapAbilityProperties']['Property5']['m_strValue']
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare lookup cost and memory of case-insensitive wrappers')
+    parser.add_argument('--path', help='json file to benchmark with, eg. decompiled-data/scripts/abilities.json. Defaults to synthetic data')
+    parser.add_argument('--count', type=int, default=2000, help='Number of synthetic abilities to generate')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs per measurement, the best is reported')
+
+    args = parser.parse_args()
+
+    raw = json_utils.read(args.path) if args.path else build_abilities(args.count)
+    keys = [key for key, value in raw.items() if isinstance(value, dict) and 'm_mapAbilityProperties' in value]
+    upper_keys = [key.upper() for key in keys]
+    sample = random.Random(0).sample(keys, min(len(keys), 50))
+
+    for name, wrap in WRAPPERS.items():
+        print(name)
+
+        wrap_time = min(timeit.repeat(lambda: wrap(raw), number=1, repeat=args.repeat))
+        print(f'  wrap:                  {wrap_time * 1000:8.1f} ms')
+
+        wrapped = wrap(raw)
+        # the first pass over the view converts every node it visits, so time it separately
+        start = time.perf_counter()
+        lookups(wrapped, keys)
+        print(f'  first lookups:         {(time.perf_counter() - start) * 1000:8.1f} ms')
+        for label, lookup_keys in [('exact case lookups', keys), ('other case lookups', upper_keys)]:
+            lookup_time = min(timeit.repeat(lambda: lookups(wrapped, lookup_keys), number=1, repeat=args.repeat))
+            print(f'  {label + ":":22} {lookup_time * 1000:8.1f} ms ({lookup_time / len(keys) / 4 * 1e9:.0f} ns per lookup)')
+
+        walk_time = min(timeit.repeat(lambda: walk(wrap(raw)), number=1, repeat=args.repeat))
+        print(f'  wrap + full walk:      {walk_time * 1000:8.1f} ms')
+
+        print(f'  peak memory, wrap:     {measure_memory(wrap, raw, touch=False) / 1024 / 1024:8.1f} MB')
+        print(f'  peak memory, sample:   {measure_memory(lambda data: lookups(wrap(data), sample), raw, touch=False) / 1024 / 1024:8.1f} MB')
+        print(f'  peak memory, walk:     {measure_memory(wrap, raw, touch=True) / 1024 / 1024:8.1f} MB')
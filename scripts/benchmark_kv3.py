@@ -0,0 +1,57 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from decompiler import kv3_parser, kv3_to_json  # noqa: E402
+
+
+def decode_keyvalues3(path):
+    """The previous decode path, using the keyvalues3 library"""
+    return kv3_to_json.read_keyvalues3(path)
+
+
+def decode_kv3_parser(path):
+    return kv3_parser.read(path)
+
+
+def measure(func, path, repeat):
+    """
+    Returns:
+        tuple of (result, best time in seconds, peak memory in bytes)
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # measure memory in a separate run, as tracing slows down the decode
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, best, peak
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare decode time and peak memory of kv3 parsers on vdata files')
+    parser.add_argument('paths', nargs='+', help='Paths to .vdata files, eg. abilities.vdata')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs per parser, the best is reported')
+
+    args = parser.parse_args()
+
+    for path in args.paths:
+        print(f'{path} ({os.path.getsize(path) / 1024 / 1024:.2f} MB)')
+        expected, old_time, old_peak = measure(decode_keyvalues3, path, args.repeat)
+        actual, new_time, new_peak = measure(decode_kv3_parser, path, args.repeat)
+
+        print(f'  keyvalues3: {old_time:.3f}s, peak {old_peak / 1024 / 1024:.1f} MB')
+        print(f'  kv3_parser: {new_time:.3f}s, peak {new_peak / 1024 / 1024:.1f} MB')
+        print(f'  speedup: {old_time / new_time:.1f}x, output matches: {actual == expected}')
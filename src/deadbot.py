@@ -6,10 +6,12 @@ from loguru import logger
 from dotenv import load_dotenv
 
 from steam.depot_downloader import DepotDownloader
-from utils import csv_writer
+from utils import csv_writer, sqlite_writer
 from decompiler.decompiler import Decompiler
 from changelogs import parse_changelogs, fetch_changelogs
 from parser import parser
+from parser.entity_manifest import EntityManifest
+from utils.build_cache import BuildCache
 from utils.meta_utils import get_deadbot_version
 from utils.parameters import load_arguments, Args
 from utils.process import run_process
@@ -31,6 +33,8 @@ def main():
     )
 
     logger.info(f'Running Deadbot v{get_deadbot_version()}')
+    build_cache = BuildCache(args.cachedir, force=args.force)
+
     # import game files from steamdb github and localization + map files using depot downloader
     if args.import_files:
         logger.info('Importing game files...')
@@ -69,19 +73,37 @@ def main():
 
     if args.decompile:
         logger.info('Decompiling source files...')
-        Decompiler(deadlock_dir=args.dldir, work_dir=args.workdir, force=args.force).run()
+        decompiler = Decompiler(
+            deadlock_dir=args.dldir,
+            work_dir=args.workdir,
+            force=args.force,
+            jobs=args.jobs,
+            binary=args.binary_workdir,
+        )
+        stage = build_cache.stage(
+            'decompile',
+            inputs=decompiler.get_source_paths(),
+            outputs=[args.workdir],
+            params={'binary_workdir': args.binary_workdir},
+        )
+        if stage.restore():
+            logger.info('Game files are unchanged, restored decompiled files from build cache')
+        else:
+            # the stage already hashed every source file, so the decompiler does not read them again
+            decompiler.run(source_hashes=stage.input_hashes)
+            stage.save()
     else:
         logger.trace('! Skipping Decompiler !')
 
     if args.parse:
         logger.info('Parsing decompiled files...')
-        act_gamefile_parse(args)
+        act_gamefile_parse(args, build_cache)
     else:
         logger.trace('! Skipping Parser !')
 
     if args.changelogs:
         logger.info('Parsing Changelogs...')
-        act_changelog_parse(args)
+        act_changelog_parse(args, build_cache)
     else:
         logger.trace('! Skipping Changelogs !')
 
@@ -95,15 +117,56 @@ def main():
     logger.success('Done!')
 
 
-def act_gamefile_parse(args: Args):
-    game_parser = parser.Parser(args.workdir, args.output, args.dldir, english_only=args.english_only, parse_map=args.parse_map)
+def act_gamefile_parse(args: Args, build_cache: BuildCache):
+    parse_inputs = [args.workdir, os.path.join(args.dldir, 'DumpSource2', 'convars.txt')]
+    if args.parse_map:
+        parse_inputs.append(os.path.join(args.dldir, 'game/citadel/maps/dl_midtown.vpk'))
+
+    stage = build_cache.stage(
+        'parse',
+        inputs=parse_inputs,
+        outputs=[
+            os.path.join(args.output, 'json'),
+            os.path.join(args.output, 'csv'),
+            os.path.join(args.output, 'sqlite'),
+            os.path.join(args.output, 'localizations'),
+            os.path.join(args.output, 'assets'),
+            os.path.join(args.output, 'item-component-tree.txt'),
+            os.path.join(args.output, 'version.txt'),
+            os.path.join(args.output, 'entity-manifest.json'),
+        ],
+        params={
+            'english_only': args.english_only,
+            'parse_map': args.parse_map,
+            'localization_deltas': args.localization_deltas,
+            'output_profile': args.output_profile,
+        },
+    )
+    if stage.restore():
+        logger.info('Decompiled files are unchanged, restored parsed files from build cache')
+        # changes.json is not cached, as it only describes the changes of the run that wrote it
+        EntityManifest(args.output).save_no_changes(args.output_profile)
+        return
+
+    game_parser = parser.Parser(
+        args.workdir,
+        args.output,
+        args.dldir,
+        english_only=args.english_only,
+        parse_map=args.parse_map,
+        jobs=args.jobs,
+        localization_deltas=args.localization_deltas,
+        output_profile=args.output_profile,
+    )
     game_parser.run()
     logger.trace('Exporting to CSV...')
-    csv_writer.export_json_file_to_csv('item-data', args.output)
-    csv_writer.export_json_file_to_csv('hero-data', args.output)
+    csv_writer.export_json_dir_to_csv(args.output, args.output_profile)
+    logger.trace('Exporting to SQLite...')
+    sqlite_writer.export_to_sqlite(args.output, args.localization_deltas)
+    stage.save()
 
 
-def act_changelog_parse(args: Args):
+def act_changelog_parse(args: Args, build_cache: BuildCache):
     chlog_fetcher = fetch_changelogs.ChangelogFetcher(
         update_existing=False,
         input_dir=args.inputdir,
@@ -111,12 +174,33 @@ def act_changelog_parse(args: Args):
     )
     chlog_fetcher.run()
 
+    # fetching always runs as it depends on the Steam Web API, but formatting only
+    # needs to rerun if the fetched changelogs or the parsed data they reference changed
+    stage = build_cache.stage(
+        'changelogs',
+        inputs=[
+            os.path.join(args.inputdir, 'changelogs'),
+            os.path.join(args.output, 'json', 'hero-data.json'),
+            os.path.join(args.output, 'json', 'item-data.json'),
+            os.path.join(args.output, 'json', 'ability-data.json'),
+            os.path.join(args.output, 'localizations', 'english.json'),
+        ],
+        outputs=[
+            os.path.join(args.output, 'changelogs', 'wiki'),
+            os.path.join(args.output, 'changelogs', 'tag_tree.json'),
+        ],
+    )
+    if stage.restore():
+        logger.info('Changelogs are unchanged, restored formatted changelogs from build cache')
+        return None
+
     chlog_parser = parse_changelogs.ChangelogParser(args.output)
     chlog_parser.run_all(chlog_fetcher.changelogs)
     chlog_parser.format_and_save_wikitext_changelogs(
         chlog_fetcher.changelogs,
         chlog_fetcher.changelog_configs,
     )
+    stage.save()
     return chlog_parser
 
 
@@ -1,11 +1,35 @@
 import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import decompiler.kv3_to_json as kv3_to_json
 import decompiler.localization as localization
 import filecmp
 import utils.game_utils as g_util
+from utils import binary_utils, file_utils, json_utils
+from utils.meta_utils import get_deadbot_version
 from loguru import logger
 
+# map of file names to read from deadlock dir to an output path in work dir
+GAMEFILE_TO_WORK_DIR = {
+    'game/citadel/pak01_dir/scripts/heroes': 'scripts/heroes',
+    'game/citadel/pak01_dir/scripts/abilities': 'scripts/abilities',
+    'game/citadel/pak01_dir/scripts/generic_data': 'scripts/generic_data',
+    'game/citadel/pak01_dir/scripts/misc': 'scripts/misc',
+    'game/citadel/pak01_dir/scripts/modifiers': 'scripts/modifiers',
+    'game/citadel/pak01_dir/scripts/npc_units': 'scripts/npc_units',
+}
+
+# All folders but voice lines and dev for now
+LOCALIZATION_FOLDERS = [
+    'citadel_attributes',
+    'citadel_gc',
+    'citadel_gc_hero_names',
+    'citadel_gc_mod_names',
+    'citadel_heroes',
+    'citadel_main',
+    'citadel_mods',
+]
+
 
 class Decompiler:
     """Handles all of the raw game data downloading and decompiling
@@ -14,14 +38,24 @@ class Decompiler:
         deadlock_dir (str): The path to the deadlock game files.
         work_dir (str): The working directory for the decompilation process.
         force (bool): If true, will decompile files even if the version already exists
+        jobs (int): Maximum number of worker processes used to decode files. If 1, files are decoded in-process
+        binary (bool): If true, game data is written in deadbot's binary format instead of json, which is faster for the parser to load
     """
 
-    def __init__(self, deadlock_dir, work_dir, force=False):
+    def __init__(self, deadlock_dir, work_dir, force=False, jobs=1, binary=False):
         self.deadlock_dir = deadlock_dir
         self.work_dir = work_dir
         self.force = force
+        self.jobs = jobs
+        self.binary = binary
+        self.manifest_path = f'{self.work_dir}/source-manifest.json'
 
-    def run(self):
+    def run(self, source_hashes=None):
+        """
+        Args:
+            source_hashes (dict, optional): Hash of source files by absolute path, eg. BuildStage.input_hashes,
+                so files that were already hashed are not read again
+        """
         steam_inf_path = f'{self.deadlock_dir}/game/citadel/steam.inf'
         version_path = f'{self.work_dir}/version.txt'
 
@@ -32,53 +66,114 @@ class Decompiler:
                 logger.info(f'Version {game_version["ClientVersion"]} is already decompiled, skipping decompile step')
                 return
 
-        shutil.rmtree(self.work_dir, ignore_errors=True)
-        self._import_game_data()
-        self._import_localization_data()
+        manifest = self._load_manifest()
+        if manifest is None:
+            # without a manifest there is no telling which files are current, so start from scratch
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+            manifest = {}
+
+        tasks = self._get_game_data_tasks() + self._get_localization_tasks()
+
+        # remove decompiled files that are no longer produced, eg. for a dropped language or after switching to binary output
+        outputs = {self._relpath(src_path, self.deadlock_dir): self._relpath(dest_path, self.work_dir) for src_path, dest_path, _ in tasks}
+        for source, entry in manifest.items():
+            if outputs.get(source) != entry['Output']:
+                logger.trace(f'Removing {entry["Output"]} as it is no longer decompiled from {source}')
+                try:
+                    os.remove(os.path.join(self.work_dir, entry['Output']))
+                except FileNotFoundError:
+                    pass
+
+        # only decode files whose source has changed since they were last decompiled
+        known_hashes = source_hashes or {}
+        source_hashes = {src_path: known_hashes.get(os.path.abspath(src_path)) or file_utils.hash_file(src_path) for src_path, _, _ in tasks}
+        stale_tasks = []
+        for src_path, dest_path, func in tasks:
+            entry = manifest.get(self._relpath(src_path, self.deadlock_dir))
+            if entry is None or entry['Hash'] != source_hashes[src_path] or not self._is_output_current(dest_path):
+                stale_tasks.append((src_path, dest_path, func))
+
+        logger.info(f'{len(stale_tasks)} of {len(tasks)} source files have changed, decompiling them')
+        failed = self._run_tasks(stale_tasks)
+
+        # record every successfully decompiled file, so failed ones are retried next run
+        self._save_manifest(
+            {
+                self._relpath(src_path, self.deadlock_dir): {
+                    'Hash': source_hashes[src_path],
+                    'Output': self._relpath(dest_path, self.work_dir),
+                }
+                for src_path, dest_path, _ in tasks
+                if src_path not in failed
+            }
+        )
+
+        if failed:
+            raise Exception(f'Failed to decompile {len(failed)} of {len(stale_tasks)} files: {failed}')
 
         # Save version information to prevent unnecessary future decompiles
         shutil.copy(steam_inf_path, version_path)
 
-    def _import_game_data(self):
+    def _load_manifest(self):
         """
-        Download bulk of the game data from https://github.com/SteamDatabase/GameTracking-Deadlock.git and convert to json
+        Load the hash of each source file as of when it was last decompiled, stored alongside version.txt
 
-        Args:
-            deadlock_dir (str): The path to the deadlock game files.
-            work_dir (str): The working directory for the decompilation process.
-            force (bool): If true, will decompile files even if the version already exists
+        Returns:
+            dict of source path -> {'Hash', 'Output'}, or None if there is no usable manifest
+        """
+        if self.force:
+            return None
+
+        manifest = json_utils.read(self.manifest_path, ignore_error=True)
+        # a different deadbot version may decompile files differently, so nothing can be reused
+        if manifest is None or manifest.get('DeadbotVersion') != get_deadbot_version():
+            return None
+
+        return manifest['Files']
+
+    def _save_manifest(self, files):
+        json_utils.write(self.manifest_path, {'DeadbotVersion': get_deadbot_version(), 'Files': files})
+
+    def _is_output_current(self, path):
+        # binary files also become stale when the binary format or python version changes
+        if path.endswith('.bin'):
+            return binary_utils.is_current(path)
+        return os.path.exists(path)
+
+    def _relpath(self, path, start):
+        # always use forward slashes so the manifest is portable between platforms
+        return os.path.relpath(path, start).replace(os.sep, '/')
+
+    def get_source_paths(self):
+        """List every game file and folder that the decompiled output is derived from"""
+        paths = [f'{self.deadlock_dir}/game/citadel/steam.inf']
+        paths += [f'{self.deadlock_dir}/{gamefile}.vdata' for gamefile in GAMEFILE_TO_WORK_DIR]
+        paths += [f'{self.deadlock_dir}/game/citadel/resource/localization/{folder}' for folder in LOCALIZATION_FOLDERS]
+        return paths
+
+    def _get_game_data_tasks(self):
+        """
+        Convert the bulk of the game data, sourced from https://github.com/SteamDatabase/GameTracking-Deadlock.git, to json or binary
 
         Returns:
-            None
+            list of (source path, output path, function) to decode each vdata file
         """
-        # map of file names to read from deadlock dir to an output path in work dir
-        GAMEFILE_TO_WORK_DIR = {
-            'game/citadel/pak01_dir/scripts/heroes': 'scripts/heroes',
-            'game/citadel/pak01_dir/scripts/abilities': 'scripts/abilities',
-            'game/citadel/pak01_dir/scripts/generic_data': 'scripts/generic_data',
-            'game/citadel/pak01_dir/scripts/misc': 'scripts/misc',
-            'game/citadel/pak01_dir/scripts/modifiers': 'scripts/modifiers',
-            'game/citadel/pak01_dir/scripts/npc_units': 'scripts/npc_units',
-        }
-
-        os.makedirs(self.work_dir, exist_ok=True)
+        os.makedirs(f'{self.work_dir}/scripts', exist_ok=True)
 
+        extension = 'bin' if self.binary else 'json'
+        tasks = []
         for gamefile, workfile in GAMEFILE_TO_WORK_DIR.items():
-            # Remove subclass and convert to json
-            kv3_to_json.process_file(f'{self.deadlock_dir}/{gamefile}.vdata', f'{self.work_dir}/{workfile}.json')
-
-    def _import_localization_data(self):
-        # All folders but voice lines and dev for now
-        LOCALIZATION_FOLDERS = [
-            'citadel_attributes',
-            'citadel_gc',
-            'citadel_gc_hero_names',
-            'citadel_gc_mod_names',
-            'citadel_heroes',
-            'citadel_main',
-            'citadel_mods',
-        ]
+            src_path = f'{self.deadlock_dir}/{gamefile}.vdata'
+            # Parse kv3 and convert to json or binary
+            tasks.append((src_path, f'{self.work_dir}/{workfile}.{extension}', kv3_to_json.process_file))
+        return tasks
 
+    def _get_localization_tasks(self):
+        """
+        Returns:
+            list of (source path, output path, function) to parse each localization file
+        """
+        tasks = []
         # Loop through each folder in the array
         for folder in LOCALIZATION_FOLDERS:
             # Construct the source path using deadlock_dir and folder name
@@ -89,6 +184,45 @@ class Decompiler:
             dest_path = f'{self.work_dir}/localizations/{dest_folder_name}'
             os.makedirs(dest_path, exist_ok=True)
 
-            # Run the Python script to parse the folder
-            localization.process_files(src_path, dest_path)
-            logger.trace(f'Parsed {src_path} to {dest_path}')
+            # each language is its own file, so split them up to keep the workers evenly loaded
+            for filename in localization.list_files(src_path):
+                dest_file = os.path.join(dest_path, filename.replace('.txt', '.json'))
+                tasks.append((os.path.join(src_path, filename), dest_file, localization.process_file))
+        return tasks
+
+    def _run_tasks(self, tasks):
+        """
+        Run each decode task, spread over a pool of worker processes when jobs > 1.
+        A failed file is logged and does not stop the others.
+
+        Args:
+            tasks (list): list of (source path, output path, function)
+
+        Returns:
+            list of source paths that failed to decompile
+        """
+        failed = []
+        if not tasks:
+            return failed
+
+        if self.jobs <= 1:
+            for src_path, dest_path, func in tasks:
+                try:
+                    func(src_path, dest_path)
+                    logger.trace(f'Decompiled {src_path}')
+                except Exception as e:
+                    logger.error(f'Failed to decompile {src_path} - {e}')
+                    failed.append(src_path)
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.jobs, len(tasks))) as executor:
+                futures = {executor.submit(func, src_path, dest_path): src_path for src_path, dest_path, func in tasks}
+                for future in as_completed(futures):
+                    src_path = futures[future]
+                    try:
+                        future.result()
+                        logger.trace(f'Decompiled {src_path}')
+                    except Exception as e:
+                        logger.error(f'Failed to decompile {src_path} - {e}')
+                        failed.append(src_path)
+
+        return failed
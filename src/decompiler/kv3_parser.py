@@ -0,0 +1,180 @@
+import re
+
+# Optional "<!-- kv3 encoding:... format:... -->" header at the start of the file
+HEADER_PATTERN = re.compile(r'\s*<!--.*?-->', re.DOTALL)
+
+# Every token is preceded by any amount of whitespace and comments, so a single match is needed per token.
+# Flags, such as "subclass:" or "resource_name:", are matched as a whole so they can be dropped
+# as soon as they are seen, leaving only the value they are attached to.
+TOKEN_PATTERN = re.compile(
+    r"""
+    (?:\s+|//[^\n]*|/\*.*?\*/)*
+    (?:
+        (?P<multiline>\"{3}\r?\n.*?\"{3})
+        |(?P<string>"(?:[^"\\]|\\.)*")
+        |(?P<flag>[A-Za-z0-9_.]+(?:\|[A-Za-z0-9_.]+)*):
+        |(?P<word>[A-Za-z0-9_.+-]+)
+        |(?P<blob>\#\[[\sA-Fa-f0-9]*\])
+        |(?P<symbol>[{}\[\]=,])
+        |(?P<error>.)
+    )?
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+
+NUMBER_PATTERN = re.compile(r'[+-]?(?:(?P<int>\d+)|(?:\d+\.\d*|\.\d+|\d+(?=[eE]))(?:[eE][+-]?\d+)?|nan|inf)', re.IGNORECASE)
+
+LITERALS = {'true': True, 'false': False, 'null': None}
+
+# What the parser expects the next token to be
+_KEY = 0
+_EQUALS = 1
+_VALUE = 2
+_SEPARATOR = 3
+_END = 4
+
+
+def read(path):
+    """Parse a kv3 text file, see loads"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return loads(f.read())
+
+
+def loads(text):
+    """
+    Parse kv3 text into plain python dicts, lists and values in a single pass.
+
+    Produces the same result as keyvalues3.read followed by kv3_to_json.kv3_to_dict, but without
+    building any intermediate kv3 objects. Flags are discarded and only their value is kept,
+    so "subclass:" objects and "resource_name:" strings, including empty ones, are read as is.
+
+    Args:
+        text (str): Contents of a kv3 text file, with or without its header
+
+    Returns:
+        The root value of the file, usually a dict
+    """
+    header = HEADER_PATTERN.match(text)
+    pos = header.end() if header is not None else 0
+
+    root = None
+    # containers that are still being filled, innermost last
+    stack = []
+    key = None
+    expect = _VALUE
+
+    for match in TOKEN_PATTERN.finditer(text, pos):
+        kind = match.lastgroup
+        if kind is None:
+            # only whitespace and comments remain
+            continue
+        token = match.group(kind)
+
+        if expect == _KEY:
+            if kind == 'word':
+                key = token
+            elif kind == 'string':
+                key = _unescape(token[1:-1])
+            elif token == '}':
+                expect = _close(stack)
+                continue
+            else:
+                _raise_unexpected(text, match, kind)
+            expect = _EQUALS
+            continue
+
+        if expect == _EQUALS:
+            if token != '=':
+                _raise_unexpected(text, match, kind)
+            expect = _VALUE
+            continue
+
+        if expect == _SEPARATOR:
+            if token == ',':
+                expect = _VALUE
+            elif token == ']':
+                expect = _close(stack)
+            else:
+                _raise_unexpected(text, match, kind)
+            continue
+
+        if expect == _END:
+            _raise_unexpected(text, match, kind)
+
+        # expecting a value
+        if kind == 'string':
+            value = _unescape(token[1:-1])
+        elif kind == 'word':
+            value = _parse_word(token, text, match)
+        elif kind == 'flag':
+            continue
+        elif kind == 'multiline':
+            # the content starts after the line break following the opening quotes
+            value = token[token.index('\n') + 1 : -3]
+        elif kind == 'blob':
+            # kv3_to_dict has no special handling for binary blobs, so they end up as their string representation
+            value = str(bytearray.fromhex(token[2:-1]))
+        elif token == '{':
+            value = {}
+        elif token == '[':
+            value = []
+        elif token == ']' and stack and type(stack[-1]) is list:
+            # empty array, or a trailing comma after the last item
+            expect = _close(stack)
+            continue
+        else:
+            _raise_unexpected(text, match, kind)
+
+        if not stack:
+            root = value
+        elif type(stack[-1]) is dict:
+            stack[-1][key] = value
+        else:
+            stack[-1].append(value)
+
+        if kind == 'symbol':
+            stack.append(value)
+            expect = _KEY if token == '{' else _VALUE
+        else:
+            expect = _next_expected(stack)
+
+    if expect != _END:
+        raise ValueError('Unexpected end of kv3 data')
+
+    return root
+
+
+def _close(stack):
+    stack.pop()
+    return _next_expected(stack)
+
+
+def _next_expected(stack):
+    if not stack:
+        return _END
+    return _KEY if type(stack[-1]) is dict else _SEPARATOR
+
+
+def _unescape(string):
+    if '\\' not in string:
+        return string
+    return string.encode('raw_unicode_escape').decode('unicode_escape')
+
+
+def _parse_word(token, text, match):
+    if token in LITERALS:
+        return LITERALS[token]
+
+    number = NUMBER_PATTERN.fullmatch(token)
+    if number is None:
+        _raise_unexpected(text, match, 'word')
+
+    if number.group('int') is not None:
+        return int(token)
+    return float(token)
+
+
+def _raise_unexpected(text, match, kind):
+    pos = match.start(kind)
+    line = text.count('\n', 0, pos) + 1
+    raise ValueError(f'Unexpected {kind} "{match.group(kind)[:32]}" in kv3 data at line {line}')
@@ -1,6 +1,9 @@
+import io
+
 import keyvalues3 as kv3
 
-from utils import json_utils
+from decompiler import kv3_parser
+from utils import binary_utils, json_utils
 
 
 # Recursively converts any object from the kv3 library into a standard, JSON-serializable Python object.
@@ -36,11 +39,8 @@ def kv3_to_json(kv3_obj, output_file):
     return json_utils.write(output_file, kv3_to_dict(kv3_obj))
 
 
-# Removes subclass features from kv3 file and writes to json
-def remove_subclass(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
+# Removes subclass features from kv3 text so it can be read by the keyvalues3 library
+def remove_subclass(content):
     # 1. Fix the non-standard "subclass:" syntax by simply removing it.
     content = content.replace('subclass:', '')
 
@@ -48,12 +48,27 @@ def remove_subclass(path):
     #    with a standard empty string before the parser sees it.
     content = content.replace('resource_name:""', '""')
 
-    with open(path, 'w', encoding='utf-8') as f:
-        f.write(content)
+    return content
+
+
+# Reads a kv3 file with the keyvalues3 library, cleaning it in memory so the source file is never modified
+def read_keyvalues3(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        content = remove_subclass(f.read())
+
+    return kv3_to_dict(kv3.read(io.StringIO(content)))
 
 
-# remove subclass and write to json file
+# parse kv3 straight to plain python objects and write to a json, or binary .bin, file
 def process_file(path, out_path):
-    remove_subclass(path)
-    data = kv3.read(path)
-    kv3_to_json(data, out_path)
+    data = kv3_parser.read(path)
+
+    if out_path.endswith('.bin'):
+        binary_utils.write(out_path, data)
+        return
+
+    # output_file should otherwise always end in .json
+    if not out_path.endswith('.json'):
+        raise ValueError('output_file must end in .json or .bin')
+
+    json_utils.write(out_path, data)
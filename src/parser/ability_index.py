@@ -0,0 +1,43 @@
+from .parsers.street_brawl import StreetBrawlParser
+
+
+class AbilityIndex:
+    """
+    Classifies every entry of the abilities script in a single pass, so each parser can iterate
+    only the abilities it handles rather than scanning and filtering the whole script itself.
+    Keys are kept in the same order as the script.
+
+    Args:
+        abilities_data (dict): Abilities script
+    """
+
+    def __init__(self, abilities_data):
+        # ability key -> m_eAbilityType, for entries that have one
+        self.types = {}
+        # keys of the abilities that have at least one Street Brawl override to apply
+        self.street_brawl_overrides = []
+
+        for key in abilities_data:
+            ability = abilities_data[key]
+            if not isinstance(ability, dict) or 'm_eAbilityType' not in ability:
+                continue
+
+            self.types[key] = ability['m_eAbilityType']
+            if _has_street_brawl_override(ability):
+                self.street_brawl_overrides.append(key)
+
+    def get_keys(self, *ability_types):
+        """Keys of the abilities of any of the given types, eg. 'EAbilityType_Item', in script order"""
+        return [key for key, ability_type in self.types.items() if ability_type in ability_types]
+
+
+def _has_street_brawl_override(node):
+    if isinstance(node, dict):
+        for override_key in StreetBrawlParser.OVERRIDE_KEYS:
+            # placeholder overrides are not applied, see StreetBrawlParser._apply_overrides
+            if node.get(override_key) not in (None, ''):
+                return True
+        return any(_has_street_brawl_override(value) for value in node.values())
+    if isinstance(node, list):
+        return any(_has_street_brawl_override(item) for item in node)
+    return False
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import threading
+
+from loguru import logger
+
+from utils import json_utils
+
+# Bump when the manifest layout or hashing changes, so an older manifest is not compared against
+MANIFEST_FORMAT_VERSION = 1
+# Hashes are truncated to this many hex characters, which is plenty to tell versions of an entity apart
+HASH_LENGTH = 16
+# Number of levels below each entity to keep hashes of, which is how precisely changed paths are reported
+PATH_DEPTH = 2
+
+
+class EntityManifest:
+    """
+    Merkle hashes of every top level entity of parsed output files, eg. each hero of hero-data.json,
+    used to find which entities changed since the previous run without diffing whole files.
+
+    Each value is hashed from the hashes of its children, so an entity's hash, and the root hash of
+    its file, changes if and only if something within it changes. Hashes of the first PATH_DEPTH
+    levels within each entity are kept, to report which paths of a modified entity changed.
+
+    save() writes the manifest to entity-manifest.json, and the differences from the previous
+    manifest to changes.json, eg.
+        {"hero-data": {"Added": [...], "Removed": [...], "Modified": {"hero_atlas": ["/BoundAbilities/signature1"]}}}
+    Paths are JSON pointers within the entity, and files without any changes are left out.
+    changes.json only ever describes the current run, so runs that skip parsing write it with save_no_changes().
+
+    Args:
+        output_dir (str): Output directory to write the manifest and changes to
+    """
+
+    def __init__(self, output_dir):
+        self.manifest_path = os.path.join(output_dir, 'entity-manifest.json')
+        self.changes_path = os.path.join(output_dir, 'changes.json')
+        self.files = {}
+        # parse stages can record their files concurrently
+        self._lock = threading.Lock()
+
+    def record(self, name, data):
+        """
+        Hash the entities of a parsed file
+
+        Args:
+            name (str): Name of the file, eg. 'hero-data'
+            data (dict): Contents of the file, keyed by entity
+        """
+        entities = {key: _hash_tree(value, PATH_DEPTH) for key, value in data.items()}
+        root = _hash_node('{', ((key, _get_hash(node)) for key, node in entities.items()))
+
+        with self._lock:
+            self.files[name] = {'Root': root, 'Entities': entities}
+
+    def save(self):
+        """Write the manifest, along with the changes since the previous manifest"""
+        previous = json_utils.read(self.manifest_path, ignore_error=True)
+        if previous is None or previous.get('Version') != MANIFEST_FORMAT_VERSION:
+            previous_files = {}
+        else:
+            previous_files = previous.get('Files', {})
+
+        changes = {}
+        for name, file in self.files.items():
+            previous_file = previous_files.get(name, {'Root': None, 'Entities': {}})
+            if previous_file['Root'] == file['Root']:
+                continue
+
+            file_changes = _diff_entities(previous_file['Entities'], file['Entities'])
+            if any(file_changes.values()):
+                changes[name] = file_changes
+                logger.trace(
+                    f'{name}: {len(file_changes["Added"])} added, {len(file_changes["Removed"])} removed, '
+                    + f'{len(file_changes["Modified"])} modified entities'
+                )
+
+        json_utils.write(self.changes_path, changes)
+        json_utils.write(self.manifest_path, {'Version': MANIFEST_FORMAT_VERSION, 'Files': json_utils.sort_dict(self.files)})
+
+    def save_no_changes(self, profile=None):
+        """
+        Write an empty changes.json, for a run where nothing was parsed as nothing changed, leaving the manifest as is
+
+        Args:
+            profile (str, optional): One of json_utils.OUTPUT_PROFILES to write it in
+        """
+        json_utils.write(self.changes_path, {}, profile)
+
+
+def _hash_tree(value, depth):
+    """
+    Returns the hash of a value, or for a dict or list within the given depth, a list of its hash
+    and the hash trees of its children. Keys of a dict are hashed in sorted order, as their order does not matter
+    """
+    if isinstance(value, dict):
+        children = {str(key): _hash_tree(child, depth - 1) for key, child in sorted(value.items(), key=lambda item: str(item[0]))}
+        node_hash = _hash_node('{', ((key, _get_hash(child)) for key, child in children.items()))
+    elif isinstance(value, list):
+        children = {str(index): _hash_tree(child, depth - 1) for index, child in enumerate(value)}
+        node_hash = _hash_node('[', ((key, _get_hash(child)) for key, child in children.items()))
+    else:
+        return hashlib.sha256(json.dumps(value).encode('utf-8')).hexdigest()[:HASH_LENGTH]
+
+    if depth <= 0:
+        return node_hash
+    return [node_hash, children]
+
+
+def _hash_node(kind, children):
+    """Hash a dict or list from the keys and hashes of its children"""
+    digest = hashlib.sha256(kind.encode('utf-8'))
+    for key, child_hash in children:
+        digest.update(json.dumps(key).encode('utf-8'))
+        digest.update(child_hash.encode('utf-8'))
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def _get_hash(node):
+    return node if isinstance(node, str) else node[0]
+
+
+def _diff_entities(previous, current):
+    """Returns the keys of added, removed and modified entities, along with the paths that changed within each"""
+    modified = {}
+    for key in current.keys() & previous.keys():
+        if _get_hash(current[key]) != _get_hash(previous[key]):
+            modified[key] = sorted(_diff_paths(previous[key], current[key], ''))
+
+    return {
+        'Added': sorted(current.keys() - previous.keys()),
+        'Removed': sorted(previous.keys() - current.keys()),
+        'Modified': json_utils.sort_dict(modified),
+    }
+
+
+def _diff_paths(previous, current, path):
+    """Returns the paths that differ between two hash trees, as precisely as their depths allow"""
+    if _get_hash(previous) == _get_hash(current):
+        return []
+    # either side is a value, or is too deep to have its children's hashes, so the node as a whole changed
+    if isinstance(previous, str) or isinstance(current, str):
+        return [path]
+
+    paths = []
+    previous_children, current_children = previous[1], current[1]
+    for key in previous_children.keys() | current_children.keys():
+        child_path = path + '/' + key.replace('~', '~0').replace('/', '~1')
+        if key not in previous_children or key not in current_children:
+            paths.append(child_path)
+        else:
+            paths.extend(_diff_paths(previous_children[key], current_children[key], child_path))
+    return paths
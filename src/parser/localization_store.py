@@ -0,0 +1,220 @@
+import os
+import threading
+from collections.abc import Mapping, MutableMapping
+
+from loguru import logger
+
+from utils import json_utils
+
+
+class LocalizationStore(Mapping):
+    """
+    Read-only mapping of languages to their merged localizations, eg. store['english'], where each
+    language is only read the first time it is accessed, so an english only parse never reads the others.
+
+    Most keys are shared by every language, so a single copy of each key string is kept and reused
+    across languages rather than one per language. Each language is stored as a LocalizationDelta,
+    which only holds the strings that differ from english.
+
+    Args:
+        localizations_dir (str): Directory of decompiled localizations, with a subdirectory per group
+        groups (list): Localization groups in order of priority, where a key from an earlier group is kept over later ones
+        languages (list): Languages that can be loaded
+    """
+
+    def __init__(self, localizations_dir, groups, languages):
+        self.localizations_dir = localizations_dir
+        self.groups = groups
+        self.languages = list(dict.fromkeys(languages))
+
+        self._localizations = {}
+        # parse stages can run concurrently, so make sure each language is only loaded once
+        self._locks = {language: threading.Lock() for language in self.languages}
+        self._keys = {}
+        self._keys_lock = threading.Lock()
+        self._english = None
+        self._english_lock = threading.Lock()
+
+    def __getitem__(self, language):
+        localization = self._localizations.get(language)
+        if localization is not None:
+            return localization
+
+        # every language is stored relative to english as it was loaded
+        if self._english is None:
+            with self._english_lock:
+                if self._english is None:
+                    self._english = self._load('english')
+
+        with self._locks[language]:
+            if language not in self._localizations:
+                if language == 'english':
+                    self._localizations[language] = LocalizationDelta(self._english)
+                else:
+                    self._localizations[language] = LocalizationDelta(self._english, self._load(language))
+                logger.trace(f'Loaded localizations for "{language}"')
+        return self._localizations[language]
+
+    def __iter__(self):
+        return iter(self.languages)
+
+    def __len__(self):
+        return len(self.languages)
+
+    def _load(self, language):
+        """
+        Merge all localization groups, including attributes, gc, heroes, main, and mods etc.
+        into a single object for the language
+        """
+        localization = {}
+        for group in self.groups:
+            data = json_utils.read(os.path.join(self.localizations_dir, group, 'citadel_' + group + '_' + language + '.json'))
+            self._merge(localization, data)
+        return localization
+
+    def _merge(self, localization, data):
+        """
+        Assigns a set of localization data to the localization of a language
+
+        Args:
+            localization (dict): merged localization of the language so far
+            data (dict): contents of a group of localization data for the same language
+                Eg. contents of citadels_heroes_danish.json
+        """
+        with self._keys_lock:
+            for key, value in data.items():
+                # Skip language key, and potentially others down the line
+                # that are not needed but shared across groups
+                if key in ['Language']:
+                    continue
+
+                if key not in localization:
+                    localization[self._share_key(key)] = value
+
+                # some keys, eg. hero_infernus:n end with ":n"
+                # this can interfere with localization, so we should also save it without the ":n"
+                if key.endswith(':n'):
+                    key_without_suffix = key[:-2]
+                    if key_without_suffix not in localization:
+                        localization[self._share_key(key_without_suffix)] = value
+
+    def _share_key(self, key):
+        """Returns the copy of a key string that is shared by every language"""
+        return self._keys.setdefault(key, key)
+
+
+_MISSING = object()
+
+
+class LocalizationDelta(MutableMapping):
+    """
+    Localizations of a language, stored as only the strings that differ from english. Strings that
+    are the same as english are read from the english localizations instead of being held twice.
+
+    Keys that english has but the language does not are still missing from it, so
+    ``key in localization`` keeps telling whether the language itself has a string for the key.
+
+    Args:
+        english (dict): English localizations, which must not be modified afterwards
+        localization (dict, optional): Localizations of the language. Defaults to the same as english
+    """
+
+    def __init__(self, english, localization=None):
+        self._english = english
+        self._changes = {}
+        # keys of english that the language has no string for
+        self._missing = set()
+        # number of keys in _changes that are not in english
+        self._added = 0
+        # bumped on every change, so a lowercase index built before a change is not used after it
+        self._version = 0
+        # (version it was built at, lowercase key -> key), see get_lowercase_index
+        self._lowercase_index = None
+
+        if localization is not None:
+            for key, value in localization.items():
+                english_value = english.get(key, _MISSING)
+                if english_value is not value and english_value != value:
+                    self._changes[key] = value
+                    if english_value is _MISSING:
+                        self._added += 1
+            self._missing = english.keys() - localization.keys()
+
+    def __getitem__(self, key):
+        value = self._changes.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if key in self._missing:
+            raise KeyError(key)
+        return self._english[key]
+
+    def __contains__(self, key):
+        return key in self._changes or (key in self._english and key not in self._missing)
+
+    def get(self, key, default=None):
+        value = self._changes.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if key in self._missing:
+            return default
+        return self._english.get(key, default)
+
+    def __setitem__(self, key, value):
+        self._version += 1
+        if key not in self._changes and key not in self._english:
+            self._added += 1
+        self._changes[key] = value
+        self._missing.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+
+        self._version += 1
+        if key in self._changes:
+            del self._changes[key]
+            if key not in self._english:
+                self._added -= 1
+        if key in self._english:
+            self._missing.add(key)
+
+    def __iter__(self):
+        for key in self._english:
+            if key not in self._missing:
+                yield key
+        for key in self._changes:
+            if key not in self._english:
+                yield key
+
+    def __len__(self):
+        return len(self._english) - len(self._missing) + self._added
+
+    def get_lowercase_index(self):
+        """Index of the lowercase of each key, for case-insensitive lookups, eg. by json_utils.CaseInsensitiveChain"""
+        version = self._version
+        if self._lowercase_index is None or self._lowercase_index[0] != version:
+            # tagged with the version it started from, so a change made while it is built causes another rebuild
+            self._lowercase_index = (version, json_utils.build_lowercase_index(self))
+        return self._lowercase_index[1]
+
+    @property
+    def english(self):
+        """English localizations the language is stored relative to"""
+        return self._english
+
+    def get_changes(self):
+        """
+        Returns the strings that differ from english and the keys of english the language has no string for,
+        which rebuild the language along with english, see from_changes. Eg. to send a language to another
+        process without sending english along with it
+        """
+        return self._changes, self._missing
+
+    @classmethod
+    def from_changes(cls, english, changes, missing):
+        """Rebuild a language from english and the result of get_changes"""
+        delta = cls(english)
+        delta._changes = dict(changes)
+        delta._missing = set(missing)
+        delta._added = sum(1 for key in changes if key not in english)
+        return delta
@@ -1,5 +1,8 @@
+import contextlib
+import multiprocessing
 import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor
 
 from .parsers import (
     abilities,
@@ -19,9 +22,13 @@ from .parsers import (
     street_brawl,
     item_investment,
 )
+from .ability_index import AbilityIndex
+from .entity_manifest import EntityManifest
+from .scheduler import ParseStage, run_stages
+from .localization_store import LocalizationStore
+from .vdata_store import VDataStore
 from utils import json_utils
 from loguru import logger
-import copy
 
 
 class Parser:
@@ -33,6 +40,9 @@ class Parser:
         language='english',
         english_only=False,
         parse_map=False,
+        jobs=1,
+        localization_deltas=False,
+        output_profile='pretty',
     ):
         # constants
         self.OUTPUT_DIR = output_dir
@@ -45,6 +55,12 @@ class Parser:
         self.data = {'scripts': {}}
         self.localization_groups = self._get_localization_groups()
         self.parse_map = parse_map
+        self.jobs = jobs
+        # set by the ability_index parse stage
+        self.ability_index = None
+        self.entity_manifest = EntityManifest(self.OUTPUT_DIR)
+        self.localization_deltas = localization_deltas
+        self.output_profile = output_profile
 
         if english_only:
             self.languages = ['english']
@@ -78,84 +94,132 @@ class Parser:
         return GROUPS
 
     def _load_vdata(self):
-        # Convert .vdata_c to .vdata and .json
-        scripts_path = 'scripts'
-
-        # Load json files to memory
-        for file_name in os.listdir(os.path.join(self.DATA_DIR, scripts_path)):
-            if file_name.endswith('.json'):
-                # path/to/scripts/abilities.json -> abilities
-                key = file_name.split('.')[0].split('/')[-1]
-                raw = json_utils.read(os.path.join(self.DATA_DIR, scripts_path, file_name))
-                self.data['scripts'][key] = json_utils.wrap_case_insensitive(raw)
+        # Scripts are read from disk the first time each one is used by a parser
+        self.data['scripts'] = VDataStore(os.path.join(self.DATA_DIR, 'scripts'))
 
     def _load_localizations(self):
-        """
-        Merge all localization groups, including attributes, gc, heroes, main, and mods etc.
-        into a single object per language
-        """
-
-        self.localizations = {}
-        # Start with english language
-        for language in ['english'] + self.languages:
-            if language not in self.localizations:
-                self.localizations[language] = {}
-                for localization_group in self.localization_groups:
-                    localization_data = json_utils.read(
-                        os.path.join(
-                            self.DATA_DIR,
-                            'localizations/',
-                            localization_group,
-                            'citadel_' + localization_group + '_' + language + '.json',
-                        )
-                    )
+        # Languages are read from disk the first time each one is used by a parser,
+        # english is always available as the fallback for missing strings
+        self.localizations = LocalizationStore(
+            os.path.join(self.DATA_DIR, 'localizations'),
+            self.localization_groups,
+            ['english'] + self.languages,
+        )
 
-                    self._merge_localizations(language, localization_group, localization_data)
+    def run(self):
+        logger.trace('Parsing...')
+        # files are written in the background while later stages parse, and only if they changed
+        with json_utils.OutputWriter(max_workers=self.jobs, profile=self.output_profile):
+            run_stages(self._get_stages(), jobs=self.jobs)
+            self.entity_manifest.save()
+        logger.trace('Done parsing')
 
-    def _merge_localizations(self, language, group, data):
+    def _get_stages(self):
         """
-        Assigns a set of localization data to self.localizations for use across the parser
+        List every parse step in the order they run serially, with the shared data each one touches.
+        Steps that do not share data run concurrently when jobs > 1, see scheduler.resolve_dependencies
 
-        Args:
-            language (str): language for the provided data
-            data (dict): contents of a group of localization data for the given language
-                Eg. contents of citadels_heroes_danish.json
+        Note that some parsers mutate their inputs, eg. HeroParser adds hero_werewolf_transformed
+        to the heroes script and its name to the localizations, so they are declared as writes
         """
-        for key, value in data.items():
-            # Skip language key, and potentially others down the line
-            # that are not needed but shared across groups
-            if key in ['Language']:
-                continue
-
-            if key not in self.localizations[language]:
-                self.localizations[language][key] = value
-
-            # some keys, eg. hero_infernus:n end with ":n"
-            # this can interfere with localization, so we should also save it without the ":n"
-            if key.endswith(':n'):
-                key_without_suffix = key[:-2]
-                if key_without_suffix not in self.localizations[language]:
-                    self.localizations[language][key_without_suffix] = value
-
-    def run(self):
-        logger.trace('Parsing...')
-        parsed_abilities = self._parse_abilities()
-        parsed_heroes = self._parse_heroes(parsed_abilities)
-        self._parsed_ability_cards(parsed_heroes)
-        parsed_items = self._parse_items()
-        self._parse_item_cards(parsed_items)
-        self._generate_resource_lookup(parsed_heroes, parsed_abilities, parsed_items)
-        self._parse_npcs(parsed_abilities)
-        self._parse_attributes()
-        self._parse_localizations()
-        self._parse_soul_unlocks()
-        self._parse_generics()
-        self._parse_item_investments()
-        self._parse_misc()
-        self._parse_convars()
-        self._parse_street_brawl(parsed_abilities)
-        self._parse_map()
-        logger.trace('Done parsing')
+        return [
+            ParseStage(
+                'ability_index',
+                self._index_abilities,
+                reads=['scripts.abilities'],
+            ),
+            ParseStage(
+                'abilities',
+                self._parse_abilities,
+                args=['ability_index'],
+                reads=['scripts.abilities', 'scripts.heroes', 'localizations'],
+            ),
+            ParseStage(
+                'heroes',
+                self._parse_heroes,
+                args=['abilities'],
+                writes=['scripts.heroes', 'scripts.abilities', 'localizations'],
+            ),
+            ParseStage(
+                'ability_cards',
+                self._parsed_ability_cards,
+                args=['heroes'],
+                reads=['scripts.abilities'],
+                writes=['localizations'],
+            ),
+            ParseStage(
+                'items',
+                self._parse_items,
+                args=['ability_index'],
+                reads=['scripts.abilities', 'scripts.generic_data', 'localizations'],
+            ),
+            ParseStage(
+                'item_cards',
+                self._parse_item_cards,
+                args=['items'],
+                reads=['scripts.abilities'],
+            ),
+            ParseStage(
+                'resource_lookup',
+                self._generate_resource_lookup,
+                args=['heroes', 'abilities', 'items'],
+            ),
+            ParseStage(
+                'npcs',
+                self._parse_npcs,
+                args=['abilities'],
+                reads=['scripts.npc_units', 'scripts.modifiers', 'scripts.misc', 'scripts.abilities', 'localizations'],
+            ),
+            ParseStage(
+                'attributes',
+                self._parse_attributes,
+                reads=['scripts.heroes', 'localizations'],
+            ),
+            ParseStage(
+                'localizations',
+                self._parse_localizations,
+                reads=['localizations'],
+            ),
+            ParseStage(
+                'soul_unlocks',
+                self._parse_soul_unlocks,
+                reads=['scripts.heroes'],
+            ),
+            ParseStage(
+                'generics',
+                self._parse_generics,
+                reads=['scripts.generic_data'],
+            ),
+            ParseStage(
+                'item_investments',
+                self._parse_item_investments,
+                reads=['scripts.heroes'],
+            ),
+            ParseStage(
+                'misc',
+                self._parse_misc,
+                reads=['scripts.misc'],
+            ),
+            ParseStage(
+                'convars',
+                self._parse_convars,
+            ),
+            ParseStage(
+                'street_brawl',
+                self._parse_street_brawl,
+                args=['abilities', 'ability_index'],
+                reads=['scripts.heroes', 'scripts.abilities', 'localizations'],
+            ),
+            ParseStage(
+                'map',
+                self._parse_map,
+            ),
+        ]
+
+    def _write_entities(self, name, data):
+        """Write a file of entities to json/, eg. hero-data.json, and hash each entity in the entity manifest"""
+        json_utils.write(self.OUTPUT_DIR + '/json/' + name + '.json', data)
+        self.entity_manifest.record(name, data)
 
     def _parse_soul_unlocks(self):
         logger.trace('Parsing Soul Unlocks...')
@@ -179,7 +243,12 @@ class Parser:
 
     def _parse_localizations(self):
         logger.trace('Parsing Localizations...')
-        return localizations.LocalizationParser(self.localizations, self.OUTPUT_DIR).run()
+        return localizations.LocalizationParser(
+            self.localizations,
+            self.OUTPUT_DIR,
+            deltas=self.localization_deltas,
+            profile=self.output_profile,
+        ).run()
 
     def _parse_heroes(self, parsed_abilities):
         logger.trace('Parsing Heroes...')
@@ -211,26 +280,32 @@ class Parser:
         )
 
         stripped_heroes = dict()
-        # Remove irrelevant data from BoundAbilities in HeroData
-        for hero_key, hero_value in copy.deepcopy(parsed_heroes).items():
-            bound_abilities = hero_value['BoundAbilities']
-            stripped_heroes[hero_key] = hero_value
-            stripped_heroes[hero_key]['BoundAbilities'] = {}
-            for ability_position, ability_data in bound_abilities.items():
-                stripped_heroes[hero_key]['BoundAbilities'][ability_position] = {
+        # Remove irrelevant data from BoundAbilities in HeroData, sharing the rest of each hero with parsed_heroes
+        for hero_key, hero_value in parsed_heroes.items():
+            stripped_abilities = {}
+            for ability_position, ability_data in hero_value['BoundAbilities'].items():
+                stripped_abilities[ability_position] = {
                     'Name': ability_data['Name'],
                     'Key': ability_data['Key'],
                 }
+            stripped_heroes[hero_key] = json_utils.project(hero_value, {'BoundAbilities': stripped_abilities})
 
-        json_utils.write(self.OUTPUT_DIR + '/json/hero-data.json', json_utils.sort_dict(stripped_heroes))
+        self._write_entities('hero-data', json_utils.sort_dict(stripped_heroes))
         return parsed_heroes
 
-    def _parse_abilities(self):
+    def _index_abilities(self):
+        """Classify the abilities script once, so parsers only iterate the abilities they handle"""
+        logger.trace('Indexing Abilities...')
+        self.ability_index = AbilityIndex(self.data['scripts']['abilities'])
+        return self.ability_index
+
+    def _parse_abilities(self, ability_index):
         logger.trace('Parsing Abilities...')
         parsed_abilities = abilities.AbilityParser(
             self.data['scripts']['abilities'],
             self.data['scripts']['heroes'],
             self.localizations[self.language],
+            keys=ability_index.get_keys('EAbilityType_Innate', 'EAbilityType_Signature', 'EAbilityType_Ultimate'),
         ).run()
 
         stripped_abilities = {}
@@ -241,35 +316,74 @@ class Parser:
 
             stripped_abilities[key] = json_utils.strip_zeroes(ability)
 
-        json_utils.write(self.OUTPUT_DIR + '/json/ability-data.json', json_utils.sort_dict(stripped_abilities))
+        self._write_entities('ability-data', json_utils.sort_dict(stripped_abilities))
         return parsed_abilities
 
     def _parsed_ability_cards(self, parsed_heroes):
         logger.trace('Parsing Ability UI...')
+        abilities = self.data['scripts']['abilities']
+
+        # the structure of the cards is the same for every language, so it is parsed once and only the strings are localized per language
+        skeletons = ability_cards.AbilityCardsParser(abilities, parsed_heroes).run()
+
+        # Every language falls back to english for missing strings, so languages that come after english
+        # must see its updated localizations, the same as when the languages are parsed one at a time
+        split = self.languages.index('english') + 1 if 'english' in self.languages else len(self.languages)
+        batches = [self.languages[:split], self.languages[split:]]
+
+        with self._get_ability_cards_pool(skeletons) as pool:
+            for batch in batches:
+                if pool is None:
+                    results = [ability_cards.AbilityCardsLocalizer(skeletons, language, self.localizations).run() for language in batch]
+                else:
+                    # only send the localizations each language needs, rather than every language to every task,
+                    # and only their changes from english, which each worker already has
+                    futures = [
+                        pool.submit(
+                            ability_cards.run_worker,
+                            language,
+                            {key: self.localizations[key].get_changes() for key in (language, 'english')},
+                        )
+                        for language in batch
+                    ]
+                    results = [future.result() for future in futures]
 
-        for language in self.languages:
-            (parsed_ability_cards, changed_localizations) = ability_cards.AbilityCardsParser(
-                self.data['scripts']['abilities'],
-                parsed_heroes,
-                language,
-                self.localizations,
-            ).run()
+                # merge in a fixed order, regardless of which language finished first
+                for language, (parsed_ability_cards, changed_localizations) in zip(batch, results):
+                    self.localizations[language].update(changed_localizations)
 
-            self.localizations[language].update(changed_localizations)
+                    # Only write to ability_cards.json for English
+                    if language == 'english':
+                        self._write_entities('ability-cards', parsed_ability_cards)
 
-            # Only write to ability_cards.json for English
-            if language == 'english':
-                json_utils.write(self.OUTPUT_DIR + '/json/ability-cards.json', parsed_ability_cards)
+    def _get_ability_cards_pool(self, skeletons):
+        """
+        Create a process pool to localize ability cards with, one language per task, or a context
+        with no pool if languages should be localized in-process
+        """
+        if self.jobs <= 1 or len(self.languages) <= 1:
+            return contextlib.nullcontext()
+
+        # other parse stages may be running on threads, which is unsafe to fork, so start workers fresh
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        return ProcessPoolExecutor(
+            max_workers=min(self.jobs, len(self.languages)),
+            mp_context=multiprocessing.get_context(start_method),
+            # the skeletons and english localizations shared by every language are sent once per worker
+            initializer=ability_cards.init_worker,
+            initargs=(skeletons, self.localizations['english'].english),
+        )
 
-    def _parse_items(self):
+    def _parse_items(self, ability_index):
         logger.trace('Parsing Items...')
         (parsed_items, item_component_chart) = items.ItemParser(
             self.data['scripts']['abilities'],
             self.data['scripts']['generic_data'],
             self.localizations[self.language],
+            keys=ability_index.get_keys('EAbilityType_Item', 'EAbilityType_Cosmetic'),
         ).run()
 
-        json_utils.write(self.OUTPUT_DIR + '/json/item-data.json', json_utils.sort_dict(parsed_items))
+        self._write_entities('item-data', json_utils.sort_dict(parsed_items))
 
         with open(self.OUTPUT_DIR + '/item-component-tree.txt', 'w') as f:
             f.write(str(item_component_chart))
@@ -277,7 +391,7 @@ class Parser:
 
     def _parse_item_cards(self, parsed_items):
         parsed_item_cards = item_cards.ItemCardParser(parsed_items=parsed_items, abilities=self.data['scripts']['abilities']).run()
-        json_utils.write(self.OUTPUT_DIR + '/json/item-cards.json', parsed_item_cards)
+        self._write_entities('item-cards', parsed_item_cards)
 
     def _parse_npcs(self, parsed_abilities):
         logger.trace('Parsing NPCs...')
@@ -289,7 +403,7 @@ class Parser:
             abilities_data=self.data['scripts']['abilities'],
         ).run()
 
-        json_utils.write(self.OUTPUT_DIR + '/json/npc-data.json', json_utils.sort_dict(parsed_npcs))
+        self._write_entities('npc-data', json_utils.sort_dict(parsed_npcs))
 
     def _parse_attributes(self):
         logger.trace('Parsing Attributes...')
@@ -334,13 +448,14 @@ class Parser:
 
         json_utils.write(self.OUTPUT_DIR + '/json/convars.json', json_utils.sort_dict(parsed_convars))
 
-    def _parse_street_brawl(self, parsed_abilities):
+    def _parse_street_brawl(self, parsed_abilities, ability_index):
         logger.trace('Parsing Street Brawl...')
         parsed_street_brawl = street_brawl.StreetBrawlParser(
             self.data['scripts']['heroes'],
             self.data['scripts']['abilities'],
             parsed_abilities,
             self.localizations[self.language],
+            ability_index.street_brawl_overrides,
         ).run()
 
         json_utils.write(self.OUTPUT_DIR + '/json/street-brawl-data.json', parsed_street_brawl)
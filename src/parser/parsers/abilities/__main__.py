@@ -19,16 +19,18 @@ DEFAULT_BOSS_DAMAGE_SCALE = 1
 
 
 class AbilityParser:
-    def __init__(self, abilities_data, heroes_data, localizations):
+    def __init__(self, abilities_data, heroes_data, localizations, keys=None):
         self.abilities_data = abilities_data
         self.heroes_data = heroes_data
         self.localizations = localizations
+        # keys of the abilities to parse, defaulting to every entry of abilities_data
+        self.keys = keys
 
     def run(self):
         all_abilities = {}
         ability_key = ''
         try:
-            for ability_key in self.abilities_data:
+            for ability_key in self.keys if self.keys is not None else self.abilities_data:
                 ability = self._parse_ability(ability_key)
                 if ability:
                     all_abilities[ability_key] = ability
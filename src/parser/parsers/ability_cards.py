@@ -1,11 +1,45 @@
 from collections import defaultdict
-from typing import TypedDict
+from typing import NamedTuple, TypedDict
 from utils import num_utils
 import utils.string_utils as string_utils
 from loguru import logger
 
+from ..localization_store import LocalizationDelta
+
 SUPPORTED_LANGS = ['english']
 
+# Inputs shared by every language, set once per worker process by init_worker
+_worker_inputs = {}
+
+
+def init_worker(skeletons, english):
+    """
+    Initializer for a process pool that localizes ability cards, one language per task
+
+    Args:
+        skeletons (dict): Ability card skeletons, see AbilityCardsParser
+        english (dict): English localizations that every LocalizationDelta is stored relative to
+    """
+    _worker_inputs['skeletons'] = skeletons
+    _worker_inputs['english'] = english
+
+
+def run_worker(language, localization_changes):
+    """
+    Localize the ability cards of a single language within a worker process, see init_worker
+
+    Args:
+        language (str): Language to localize
+        localization_changes (dict): LocalizationDelta.get_changes() of at least the given language and english,
+            which is used as a fallback. Only the changes are sent to each task, as english is sent once per worker
+
+    Returns:
+        tuple of (localized ability cards, localization updates)
+    """
+    english = _worker_inputs['english']
+    localizations = {key: LocalizationDelta.from_changes(english, *changes) for key, changes in localization_changes.items()}
+    return AbilityCardsLocalizer(_worker_inputs['skeletons'], language, localizations).run()
+
 
 class ParsedProp(TypedDict):
     key: str | None
@@ -15,6 +49,45 @@ class ParsedProp(TypedDict):
     show_prop: bool
 
 
+class LocalizationHole(NamedTuple):
+    """
+    A localized string within an ability card skeleton, which is filled in separately for each language
+
+    Kinds of hole:
+    - *string* - localized string of the key, or the fallback if there is none
+    - *label* - localized string of the '[key]_label' attribute label, or None if the language has none
+    - *description* - the key itself, if the language has a description for it. The description is
+      formatted with format_vars and the language's localizations, and saved as a localization update
+
+    The value is set at each path within the card. Optional slots are removed instead when the
+    language has no string for them
+    """
+
+    kind: str
+    key: str
+    paths: list
+    fallback: str | None = None
+    format_vars: tuple = ()
+    optional: bool = False
+
+
+class AbilityCardSkeleton(NamedTuple):
+    """
+    Language independent structure of a single ability card
+
+    Args:
+        key (str): Ability key
+        card (dict): Parsed card, with a placeholder for each hole. None if the ability has no card
+        holes (list): LocalizationHoles, in the order they are resolved
+        error (Exception): Error raised while parsing the card, which is raised again once its holes are resolved
+    """
+
+    key: str
+    card: dict | None
+    holes: list
+    error: Exception | None
+
+
 class AbilityCardsParser:
     """
     Takes in parsed hero data (hero-data.json) and for each hero, format their abilities for
@@ -35,79 +108,63 @@ class AbilityCardsParser:
     Remaining data categories contain those that do not appear in Info[x].
     Important ones include *Cooldown* and *Charges*, as those are specifically shown in the
     top corners of the ability card
+
+    Only the localized strings of a card differ between languages, so this parses the structure of
+    each card once, and AbilityCardsLocalizer fills in the strings for each language
     """
 
-    def __init__(self, abilities, parsed_heroes, language, localizations):
+    def __init__(self, abilities, parsed_heroes):
         self.abilities = abilities
         self.parsed_heroes = parsed_heroes
-        self.language = language
-        self.localizations = localizations
-        self.localization_updates = {}
 
         self.DESC_KEY_IGNORE_LIST = [
             'citadel_ability_chrono_kinetic_carbine_t1_desc',
             'ability_smoke_bomb_t1_desc',
         ]
 
-        self.not_found_localization_keys = []
-
     def run(self):
         output = {}
         for self.hero_key, self.hero in self.parsed_heroes.items():
-            hero_abilities = {'Name': self.hero['Name']}
+            hero_skeleton = {
+                'Name': self.hero['Name'],
+                'InDevelopment': self.hero.get('InDevelopment', False),
+                'Abilities': {},
+            }
             for self.ability_index, ability in self.hero['BoundAbilities'].items():
-                try:
-                    parsed_ui = self._parse_ability_card(ability)
-                    if parsed_ui is not None:
-                        hero_abilities[self.ability_index] = parsed_ui
-                except Exception as e:
-                    # only exit the parser for a supported wiki language
-                    # AND hero is not unreleased
-                    err_message = (
-                        f'Failed to parse ui - hero: {self.hero["Name"]}, ability: '
-                        f'{self.ability_index} - {ability["Key"]}, language: {self.language} - {e}'
-                    )
+                hero_skeleton['Abilities'][self.ability_index] = self._parse_ability_card(ability)
 
-                    if self.language in SUPPORTED_LANGS and not self.hero['InDevelopment']:
-                        logger.error(err_message)
-                        raise e
-                    else:
-                        logger.trace(err_message)
+            output[self.hero_key] = hero_skeleton
 
-            output[self.hero_key] = hero_abilities
+        return output
 
-        return (output, self.localization_updates)
+    def _parse_ability_card(self, ability):
+        self.holes = []
+        try:
+            card = self._parse_card_structure(ability)
+        except Exception as e:
+            # errors are only reported once the holes before them are resolved, as they depend on the language
+            return AbilityCardSkeleton(ability.get('Key'), None, self.holes, e)
 
-    def _update_localization(self, key: str, value: str):
-        """Update localization, prioritizing released heroes over unreleased ones."""
-        if not self.hero.get('InDevelopment', False) or key not in self.localization_updates:
-            self.localization_updates[key] = value
+        return AbilityCardSkeleton(self.ability_key, card, self.holes, None)
 
-    def _parse_ability_card(self, ability):
+    def _add_hole(self, kind, key, paths, **kwargs):
+        hole = LocalizationHole(kind, key, paths, **kwargs)
+        self.holes.append(hole)
+        return hole
+
+    def _parse_card_structure(self, ability):
         self.ability = ability
         self.ability_key = ability['Key']
 
         parsed_ui = {
             'Key': self.ability_key,
-            'Name': self._get_localized_string(self.ability_key, fallback=f'Unknown({self.ability_key})'),
+            'Name': None,
         }
+        self._add_hole('string', self.ability_key, [('Name',)], fallback=f'Unknown({self.ability_key})')
 
-        ability_desc_key = self.ability_key + '_desc'
         # some description keys are not found as they have a specific description per info section
-        if ability_desc_key in self.localizations[self.language]:
-            ability_desc = self._get_localized_string(self.ability_key + '_desc')
-            # required variables to insert into the description
-            format_vars = (
-                self.ability,
-                {'ability_key': self.ability_index},
-                {'hero_name': self.hero['Name']},
-                self.localizations[self.language],
-            )
-            ability_desc = string_utils.format_description(ability_desc, *format_vars)
-            parsed_ui['DescKey'] = ability_desc_key
-
-            # Prioritize released heroes to prevent WIP hero names from overwriting live ones
-            self._update_localization(ability_desc_key, ability_desc)
+        parsed_ui['DescKey'] = None
+        self._add_hole('description', self.ability_key + '_desc', [('DescKey',)], format_vars=self._get_format_vars(), optional=True)
 
         raw_ability = self._get_raw_ability()
 
@@ -132,6 +189,8 @@ class AbilityCardsParser:
                 if key not in handled_keys:
                     raise Exception(f'Unhandled key in info section {key}')
 
+            info_key = f'Info{index + 1}'
+
             # Each info section consists of some combination of
             # title, description, main properties, and alternate properties
             parsed_info_section = {
@@ -157,32 +216,19 @@ class AbilityCardsParser:
                     desc_key = desc_key[len('#') :]
                 else:
                     raise Exception(f'Invalid description key {desc_key}, expecting the # prefix')
-                if desc_key in self.localizations[self.language]:
-                    # raise Exception(f'Missing description for key {desc_key}')
-
-                    description = self._get_localized_string(desc_key)
-                    # required variables to insert into the description
-                    format_vars = (
-                        self.ability,
-                        {'ability_key': self.ability_index},
-                        {'hero_name': self.hero['Name']},
-                        self.localizations[self.language],
-                    )
-                    parsed_info_section['DescKey'] = desc_key
-
-                    description = string_utils.format_description(description, *format_vars)
 
-                    # update localization file with formatted description
-                    self._update_localization(desc_key, description)
+                # update localization file with formatted description
+                parsed_info_section['DescKey'] = None
+                self._add_hole('description', desc_key, [(info_key, 'DescKey')], format_vars=self._get_format_vars(), optional=True)
 
             # some blocks might just be a description
             if 'm_vecAbilityPropertiesBlock' in info_section:
-                parsed_info_section['Main'] = self._parse_main_block(info_section)
+                parsed_info_section['Main'] = self._parse_main_block(info_section, (info_key, 'Main'))
 
             if 'm_vecBasicProperties' in info_section:
-                parsed_info_section['Alt'] = self._parse_alt_block(info_section)
+                parsed_info_section['Alt'] = self._parse_alt_block(info_section, (info_key, 'Alt'))
 
-            parsed_ui[f'Info{index + 1}'] = parsed_info_section
+            parsed_ui[info_key] = parsed_info_section
 
         parsed_ui['Upgrades'] = self._parse_upgrades()
 
@@ -190,27 +236,38 @@ class AbilityCardsParser:
 
         return parsed_ui
 
-    def _parse_main_block(self, info_section):
+    def _get_format_vars(self, *data):
+        """Variables to insert into a description, to which the localizations of each language are added"""
+        return (
+            self.ability,
+            *data,
+            {'ability_key': self.ability_index},
+            {'hero_name': self.hero['Name']},
+        )
+
+    def _parse_main_block(self, info_section, path):
         main_block = {'Props': []}
 
         props_block = info_section['m_vecAbilityPropertiesBlock']
         for props in props_block:
-            title = None
+            title_paths = None
             title_key = props.get('m_strPropertiesTitleLocString')
             if title_key is not None:
                 title_key = title_key.replace('#', '')
                 if title_key != '':
-                    title = self._get_localized_string(title_key)
+                    # the title is shared by every prop in the block
+                    title_paths = self._add_hole('string', title_key, []).paths
 
             ability_props = props.get('m_vecAbilityProperties')
             if not ability_props:
                 continue
 
             for ability_prop in ability_props:
-                if title is None:
+                prop_path = (*path, 'Props', len(main_block['Props']))
+                if title_paths is None:
                     prop_object = {}
                 else:
-                    prop_object = {'Title': title}
+                    prop_object = {'Title': None}
 
                 parsed_prop = self._parse_ability_prop(ability_prop)
 
@@ -228,9 +285,12 @@ class AbilityCardsParser:
                 prop_object.update(
                     {
                         'Key': attr_key,
-                        'Name': self._get_localized_string(attr_key + '_label', fallback=f'Unknown({attr_key})'),
+                        'Name': None,
                     },
                 )
+                if title_paths is not None:
+                    title_paths.append((*prop_path, 'Title'))
+                self._add_hole('string', attr_key + '_label', [(*prop_path, 'Name')], fallback=f'Unknown({attr_key})')
 
                 if parsed_prop['status_effect']:
                     prop_object['StatusEffect'] = parsed_prop['status_effect']
@@ -279,16 +339,14 @@ class AbilityCardsParser:
 
         return attribute
 
-    def _parse_alt_block(self, info_section):
+    def _parse_alt_block(self, info_section, path):
         alt_block = []
         for prop in info_section['m_vecBasicProperties']:
             prop_object = {
                 'Key': prop,
+                'Name': None,
             }
-
-            name = self._get_ability_display_name(prop)
-            if name is not None:
-                prop_object['Name'] = name
+            self._add_hole('label', prop, [(*path, len(alt_block), 'Name')], optional=True)
 
             prop_value = self.ability.get(prop)
             if isinstance(prop_value, dict):
@@ -324,8 +382,10 @@ class AbilityCardsParser:
 
         for prop in self.ability:
             data = {
-                'Name': self._get_ability_display_name(prop),
+                'Name': None,
             }
+            # the label is looked up even when the prop is skipped, so a missing label is still reported
+            name_paths = self._add_hole('label', prop, []).paths
 
             raw_attr = self._get_raw_ability_attr(prop)
             if raw_attr is None:
@@ -358,6 +418,7 @@ class AbilityCardsParser:
                 'Radius',
             ]:
                 rest_of_data[prop] = data
+                name_paths.append((prop, 'Name'))
                 continue
 
             # skip any attributes that are already placed in other categories
@@ -366,37 +427,40 @@ class AbilityCardsParser:
 
             match attr_type:
                 case 'cooldown' | 'charge_cooldown':
-                    rest_of_data['Cooldown'][prop] = data
+                    category = 'Cooldown'
 
                 case 'duration':
-                    rest_of_data['Duration'][prop] = data
+                    category = 'Duration'
 
                 case 'range' | 'distance' | 'radius' | 'time':
-                    rest_of_data['Range'][prop] = data
+                    category = 'Range'
 
                 case 'damage' | 'bullet_damage' | 'tech_damage' | 'melee_damage' | 'fire_rate':
-                    rest_of_data['Damage'][prop] = data
+                    category = 'Damage'
 
                 case 'healing' | 'health':
-                    rest_of_data['Health'][prop] = data
+                    category = 'Health'
 
                 case 'bullet_armor_up' | 'tech_armor_up':
-                    rest_of_data['Buff'][prop] = data
+                    category = 'Buff'
 
                 case 'slow' | 'tech_armor_down' | 'bullet_armor_down':
-                    rest_of_data['Debuff'][prop] = data
+                    category = 'Debuff'
 
                 case 'cast':
-                    rest_of_data['Cast'][prop] = data
+                    category = 'Cast'
 
                 case 'move_speed':
-                    rest_of_data['Move'][prop] = data
+                    category = 'Move'
 
                 case None | '':
-                    rest_of_data['Other'][prop] = data
+                    category = 'Other'
                 case _:
                     raise Exception(f'Unhandled ability attr type "{attr_type}" on {prop} attribute')
 
+            rest_of_data[category][prop] = data
+            name_paths.append((category, prop, 'Name'))
+
         # Clear out any empty arrays
         cleared_data = {}
         for key, value in rest_of_data.items():
@@ -419,18 +483,23 @@ class AbilityCardsParser:
             desc_key = f'{self.ability["Key"]}_t{index + 1}_desc'
 
             # this key in particular is not accurate to the one in game
-            ignore_desc_key = False
             if desc_key in self.DESC_KEY_IGNORE_LIST:
-                ignore_desc_key = True
-
-            if desc_key in self.localizations[self.language] and not ignore_desc_key:
-                upgrade_desc = self._format_desc(desc_key, upgrade)
+                parsed_upgrades.append(upgrade)
+                continue
 
-                # update localization file with formatted description
-                self._update_localization(desc_key, upgrade_desc)
-                upgrade['DescKey'] = desc_key
+            # the description is formatted with the upgrade as it was before the key is added
+            parsed_upgrade = dict(upgrade)
+            optional = 'DescKey' not in parsed_upgrade
+            parsed_upgrade.setdefault('DescKey', None)
+            self._add_hole(
+                'description',
+                desc_key,
+                [('Upgrades', index, 'DescKey')],
+                format_vars=self._get_format_vars(self._get_token_overrides(upgrade), upgrade),
+                optional=optional,
+            )
 
-            parsed_upgrades.append(upgrade)
+            parsed_upgrades.append(parsed_upgrade)
 
         return parsed_upgrades
 
@@ -442,8 +511,9 @@ class AbilityCardsParser:
         When two properties have the same bonus value and CSS class, and one is marked
         as canonical (m_bCanSetTokenOverride=True), remove the internal one.
         """
+        # always return a copy, as the upgrade belongs to the parsed abilities shared with other parsers
         if not upgrade:
-            return upgrade
+            return dict(upgrade)
 
         # Build lookup of (bonus_value, css_class) -> [prop_names]
         groups = defaultdict(list)
@@ -473,6 +543,139 @@ class AbilityCardsParser:
 
         return {k: v for k, v in upgrade.items() if k not in props_to_remove}
 
+    def _get_raw_ability_attr(self, attr_key):
+        return self._get_raw_ability()['m_mapAbilityProperties'].get(attr_key)
+
+    def _get_raw_ability(self):
+        return self.abilities[self.ability_key]
+
+    def _get_token_overrides(self, data):
+        """
+        Map the localization tokens of any attributes in data to their values, for replacing
+        variable names in a description
+
+        Args:
+            data (dict): a set of data for replacing variable names in the description
+        """
+        # check all attributes in data, and see if they have a localization mapping
+        overrides = {}
+        for attr, value in data.items():
+            raw_attr = self._get_raw_ability_attr(attr)
+            if raw_attr is None:
+                continue
+
+            # if a token override is found, add it to the set of data for replacement
+            token_override = raw_attr.get('m_strLocTokenOverride')
+            if token_override is not None:
+                overrides[token_override] = value
+
+        return overrides
+
+
+class AbilityCardsLocalizer:
+    """
+    Fills in the localized strings of the ability card skeletons parsed by AbilityCardsParser
+    for a single language, which only costs a lookup per string rather than a full parse
+    """
+
+    def __init__(self, skeletons, language, localizations):
+        self.skeletons = skeletons
+        self.language = language
+        self.localizations = localizations
+        self.localization_updates = {}
+
+        self.not_found_localization_keys = []
+
+    def run(self):
+        output = {}
+        for hero_key, self.hero in self.skeletons.items():
+            hero_abilities = {'Name': self.hero['Name']}
+            for ability_index, skeleton in self.hero['Abilities'].items():
+                try:
+                    parsed_ui = self._fill_ability_card(skeleton)
+                    if parsed_ui is not None:
+                        hero_abilities[ability_index] = parsed_ui
+                except Exception as e:
+                    # only exit the parser for a supported wiki language
+                    # AND hero is not unreleased
+                    err_message = (
+                        f'Failed to parse ui - hero: {self.hero["Name"]}, ability: {ability_index} - {skeleton.key}, language: {self.language} - {e}'
+                    )
+
+                    if self.language in SUPPORTED_LANGS and not self.hero['InDevelopment']:
+                        logger.error(err_message)
+                        raise e
+                    else:
+                        logger.trace(err_message)
+
+            output[hero_key] = hero_abilities
+
+        return (output, self.localization_updates)
+
+    def _fill_ability_card(self, skeleton):
+        card = None if skeleton.card is None else dict(skeleton.card)
+        # only the containers leading to a hole are copied, the rest is shared with the skeleton
+        copied = set()
+
+        for hole in skeleton.holes:
+            value = self._resolve_hole(hole)
+            # holes are still resolved for cards that are not output, for their localization updates and errors
+            if card is None:
+                continue
+
+            if value is None and hole.kind == 'description' and not hole.optional:
+                continue
+
+            for path in hole.paths:
+                self._fill_slot(card, path, value, hole.optional, copied)
+
+        if skeleton.error is not None:
+            raise skeleton.error
+
+        return card
+
+    def _resolve_hole(self, hole):
+        match hole.kind:
+            case 'string':
+                return self._get_localized_string(hole.key, fallback=hole.fallback)
+
+            case 'label':
+                return self._get_ability_display_name(hole.key)
+
+            case 'description':
+                if hole.key not in self.localizations[self.language]:
+                    return None
+
+                description = self._get_localized_string(hole.key)
+                description = string_utils.format_description(description, *hole.format_vars, self.localizations[self.language])
+
+                # Prioritize released heroes to prevent WIP hero names from overwriting live ones
+                self._update_localization(hole.key, description)
+                return hole.key
+
+            case _:
+                raise Exception(f'Unhandled localization hole kind {hole.kind}')
+
+    def _fill_slot(self, card, path, value, optional, copied):
+        node = card
+        for key in path[:-1]:
+            child = node[key]
+            if id(child) not in copied:
+                child = dict(child) if isinstance(child, dict) else list(child)
+                node[key] = child
+                copied.add(id(child))
+            node = child
+
+        if value is None and optional:
+            del node[path[-1]]
+        else:
+            node[path[-1]] = value
+
+    def _update_localization(self, key: str, value: str):
+        """Update localization, prioritizing released heroes over unreleased ones."""
+        if not self.hero['InDevelopment'] or key not in self.localization_updates:
+            self.localization_updates[key] = value
+
     def _get_uom(self, attr, value):
         """
         Extract unit of measurement for an attribute, either using the *[attr]_postfix* localization
@@ -508,46 +711,6 @@ class AbilityCardsParser:
 
         return self._get_localized_string(localized_key)
 
-    def _get_raw_ability_attr(self, attr_key):
-        return self._get_raw_ability()['m_mapAbilityProperties'].get(attr_key)
-
-    def _get_raw_ability(self):
-        return self.abilities[self.ability_key]
-
-    def _format_desc(self, desc_key, data):
-        """Formats a localized descriptions with ability data
-
-        Args:
-            desc_key (string): key linking to the localized string in the localization data
-            data (dict): a set of data for replacing variable names in the description
-        """
-        desc = self._get_localized_string(desc_key)
-
-        # check all attributes in data, and see if they have a localization mapping
-        overrides = {}
-        for attr, value in data.items():
-            raw_attr = self._get_raw_ability_attr(attr)
-            if raw_attr is None:
-                continue
-
-            # if a token override is found, add it to the set of data for replacement
-            token_override = raw_attr.get('m_strLocTokenOverride')
-            if token_override is not None:
-                overrides[token_override] = value
-
-        # required variables to insert into the description
-        format_vars = (
-            self.ability,
-            overrides,
-            data,
-            {'ability_key': self.ability_index},
-            {'hero_name': self.hero['Name']},
-            self.localizations[self.language],
-        )
-
-        formatted_desc = string_utils.format_description(desc, *format_vars)
-        return formatted_desc
-
     def _get_localized_string(self, key, fallback=None):
         OVERRIDES = {
             'MoveSlowPercent_label': 'MovementSlow_label',
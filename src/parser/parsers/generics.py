@@ -16,6 +16,7 @@ class GenericParser:
     def __init__(self, output_dir, generic_data):
         self.STRUCTURE_KEYS_TO_VALIDATE = ['ObjectiveParams', 'RejuvParams', 'ItemPricePerTier']
         self.POSSIBLE_PREFIXES = ['m_str', 'm_map', 'm_n', 'm_fl', 'm_', 'fl', 'E', 'n']
+        self.prefix_stripper = string_utils.PrefixStripper(self.POSSIBLE_PREFIXES)
         self.generic_data_dir = output_dir
         self.generic_data = generic_data
 
@@ -28,7 +29,7 @@ class GenericParser:
 
     def run(self):
         # Parse generic data
-        parsed_generics = self._remove_prefixes(self.generic_data, self.POSSIBLE_PREFIXES)
+        parsed_generics = self.prefix_stripper.transform(self.generic_data)
 
         # Read existing generic data
         existing_generics = self._read()
@@ -45,28 +46,3 @@ class GenericParser:
                 )
 
         return parsed_generics
-
-    def _remove_prefixes(self, generic_data, possible_prefixes):
-        """
-        Recursively remove prefixes from keys in a dictionary
-        """
-        new = dict()
-        for key, value in generic_data.items():
-            # Remove prefix from the key
-            for possible_prefix in possible_prefixes:
-                new_key = string_utils.remove_prefix(key, possible_prefix)
-                if new_key != key:
-                    # prefix found
-                    break
-
-            # If value is a container, recursively remove prefixes
-            if isinstance(value, dict):
-                value = self._remove_prefixes(value, possible_prefixes)
-            elif isinstance(value, list):
-                for i, elem in enumerate(value):
-                    if isinstance(elem, dict):
-                        value[i] = self._remove_prefixes(elem, possible_prefixes)
-
-            new[new_key] = value
-
-        return new
@@ -1,4 +1,3 @@
-import copy
 import parser.maps as maps
 import utils.json_utils as json_utils
 from utils import num_utils
@@ -136,16 +135,21 @@ class HeroParser:
     def _create_werewolf_transformed(self):
         """Create a copy hero_werewolf data and modify its bound abilities to use the transformed abilities and weapon"""
         werewolf: dict = self.hero_data['hero_werewolf']
-        werewolf_transformed: dict = copy.deepcopy(werewolf)
+        # only the changed parts of the werewolf are copied, the rest is shared with it
+        overrides = {}
 
         # Werewolf claws use alt-fire scaling as their base bullet damage modifier
-        if 'm_mapStandardLevelUpUpgrades' in werewolf_transformed:
-            upgrades = werewolf_transformed['m_mapStandardLevelUpUpgrades']
+        if 'm_mapStandardLevelUpUpgrades' in werewolf:
+            upgrades = werewolf['m_mapStandardLevelUpUpgrades']
             if 'MODIFIER_VALUE_BASE_BULLET_DAMAGE_FROM_LEVEL_ALT_FIRE' in upgrades:
                 # Werewolf claws use alt-fire scaling as their primary damage scaling
-                upgrades['MODIFIER_VALUE_BASE_BULLET_DAMAGE_FROM_LEVEL'] = upgrades['MODIFIER_VALUE_BASE_BULLET_DAMAGE_FROM_LEVEL_ALT_FIRE']
+                upgrades = json_utils.project(
+                    upgrades,
+                    {'MODIFIER_VALUE_BASE_BULLET_DAMAGE_FROM_LEVEL': upgrades['MODIFIER_VALUE_BASE_BULLET_DAMAGE_FROM_LEVEL_ALT_FIRE']},
+                )
                 # Remove the alt-fire key to keep the data clean
                 del upgrades['MODIFIER_VALUE_BASE_BULLET_DAMAGE_FROM_LEVEL_ALT_FIRE']
+                overrides['m_mapStandardLevelUpUpgrades'] = upgrades
 
         # Treat claws as having no ammo limit (continuous attacks during transformation)
         claws_id = 'citadel_weapon_werewolf_claws'
@@ -155,12 +159,14 @@ class HeroParser:
         transformation_ability = self.abilities_data['ability_werewolf_transformation']
         modifier = transformation_ability['m_WerewolfModifier']
 
-        for key in werewolf_transformed['m_mapBoundAbilities']:
+        bound_abilities = {}
+        for key in werewolf['m_mapBoundAbilities']:
             new_ability = modifier['m_mapWerewolfAbilities'].get(key)
             if new_ability:
-                werewolf_transformed['m_mapBoundAbilities'][key] = new_ability
+                bound_abilities[key] = new_ability
+        overrides['m_mapBoundAbilities'] = json_utils.project(werewolf['m_mapBoundAbilities'], bound_abilities)
 
-        return werewolf_transformed
+        return json_utils.project(werewolf, overrides)
 
     def _get_meaningful_stats(self, all_hero_stats):
         """
@@ -18,23 +18,7 @@ class ItemInvestmentParser:
 
     def __init__(self, heroes_data):
         self.heroes_data = heroes_data
-
-    def _clean_keys(self, data: dict) -> dict:
-        """Recursively remove prefixes from keys in a dictionary."""
-        cleaned = {}
-        for key, value in data.items():
-            new_key = key
-            for prefix in self.PREFIXES:
-                new_key = string_utils.remove_prefix(key, prefix)
-                if new_key != key:
-                    break
-
-            # If value is a dict, recursively clean its keys
-            if isinstance(value, dict):
-                value = self._clean_keys(value)
-
-            cleaned[new_key] = value
-        return cleaned
+        self.prefix_stripper = string_utils.PrefixStripper(self.PREFIXES)
 
     def run(self) -> dict:
         first = None
@@ -54,8 +38,8 @@ class ItemInvestmentParser:
             remapped = {}
             for slot, entries in hero_data['m_MapModCostBonuses'].items():
                 if slot in INVESTMENT_SLOT_MAP:
-                    # Clean prefixes from keys (e.g. m_nGoldThreshold -> GoldThreshold)
-                    cleaned_entries = [self._clean_keys(entry) for entry in entries]
+                    # Clean prefixes from keys (e.g. m_nGoldThreshold -> GoldThreshold), only within nested dicts
+                    cleaned_entries = [self.prefix_stripper.transform(entry, recurse_lists=False) for entry in entries]
                     remapped[INVESTMENT_SLOT_MAP[slot]] = cleaned_entries
                 else:
                     logger.warning(f'Unknown investment slot {slot} in hero {hero_key}')
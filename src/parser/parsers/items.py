@@ -9,16 +9,18 @@ from loguru import logger
 
 
 class ItemParser:
-    def __init__(self, abilities_data, generic_data, localizations):
+    def __init__(self, abilities_data, generic_data, localizations, keys=None):
         self.abilities_data = abilities_data
         self.generic_data = generic_data
         self.localizations = localizations
+        # keys of the abilities to parse, defaulting to every entry of abilities_data
+        self.keys = keys
         self.nodes = []
         self.links = []
 
     def run(self):
         all_items = {}
-        for key in self.abilities_data:
+        for key in self.keys if self.keys is not None else self.abilities_data:
             ability = self.abilities_data[key]
             if not isinstance(ability, dict):
                 continue
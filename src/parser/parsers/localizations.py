@@ -1,17 +1,57 @@
 import os
 
+import utils.file_utils as file_utils
 import utils.json_utils as json_utils
 
 
 class LocalizationParser:
-    def __init__(self, localization_data, output_dir):
+    """
+    Writes the localizations of each language
+
+    Args:
+        localization_data (Mapping): Localizations of each language
+        output_dir (str): Output directory
+        deltas (bool): If set, only write the strings of other languages that differ from english,
+            as anything missing falls back to english
+        profile (str): One of json_utils.OUTPUT_PROFILES to write the localizations in. For 'compact+zstd',
+            every language is compressed with the same dictionary, written to localizations/localizations.dict
+    """
+
+    def __init__(self, localization_data, output_dir, deltas=False, profile='pretty'):
         self.OUTPUT_DIR = output_dir
         self.localizations_data = localization_data
+        self.deltas = deltas
+        self.profile = profile
 
     def run(self):
         os.makedirs(self.OUTPUT_DIR + '/localizations', exist_ok=True)
+
+        # the dictionary is trained on every language, so they are only written once all are encoded
+        contents = {}
         for language, language_data in self.localizations_data.items():
-            json_utils.write(
-                self.OUTPUT_DIR + '/localizations/' + language + '.json',
-                json_utils.sort_dict(language_data),
-            )
+            if self.deltas and language != 'english':
+                language_data = self._get_delta(language_data)
+
+            content = json_utils.encode(json_utils.sort_dict(language_data), self.profile)
+            if self.profile == 'compact+zstd':
+                contents[language] = content
+            else:
+                json_utils.write_output(self._get_path(language), content, self.profile)
+
+        dict_path = self.OUTPUT_DIR + '/localizations/localizations.dict'
+        zstd_dict = file_utils.train_zstd_dictionary(list(contents.values()))
+        if zstd_dict is not None:
+            json_utils.write_output(dict_path, zstd_dict.as_bytes(), 'compact')
+        elif os.path.exists(dict_path):
+            # left over from a run with another profile
+            os.remove(dict_path)
+
+        for language, content in contents.items():
+            json_utils.write_output(self._get_path(language), content, self.profile, zstd_dict)
+
+    def _get_path(self, language):
+        return self.OUTPUT_DIR + '/localizations/' + language + '.json'
+
+    def _get_delta(self, language_data):
+        english = self.localizations_data['english']
+        return {key: value for key, value in language_data.items() if key not in english or english[key] != value}
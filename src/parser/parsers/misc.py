@@ -39,63 +39,20 @@ class MiscParser:
 
     def __init__(self, misc_data):
         self.misc_data = misc_data
+        self.prefix_stripper = string_utils.PrefixStripper(self.PREFIXES)
 
     def run(self):
-        parsed = self._remove_prefixes(self.misc_data, self.PREFIXES)
+        # Strip prefixes from keys, filter out internal data, and skip containers left empty
+        parsed = self.prefix_stripper.transform(self.misc_data, skip_key=self._skip_key, rename_key=self._clean_key, prune_empty=True)
         return parsed
 
-    def _remove_prefixes(self, data, prefixes):
-        """Recursively strip prefixes from keys and filter out internal data."""
-        if isinstance(data, dict):
-            result = {}
+    def _skip_key(self, key):
+        # Skip internal metadata keys and base class definitions
+        return key in self.METADATA_KEYS or key.endswith('_base')
 
-            for key, value in data.items():
-                # Skip internal metadata keys
-                if key in self.METADATA_KEYS:
-                    continue
-
-                # Skip base class definitions
-                if key.endswith('_base'):
-                    continue
-
-                # Strip prefix from key
-                clean_key = key
-                for prefix in prefixes:
-                    clean_key = string_utils.remove_prefix(key, prefix)
-                    if clean_key != key:
-                        break
-
-                # Force-strip m_ prefix when followed by lowercase
-                # e.g. m_modifierProvidedByAura -> modifierProvidedByAura
-                if clean_key.startswith('m_') and len(clean_key) > 2:
-                    clean_key = clean_key[2:]
-
-                # Recurse into nested structures
-                if isinstance(value, dict):
-                    value = self._remove_prefixes(value, prefixes)
-                elif isinstance(value, list):
-                    value = self._remove_prefixes_from_list(value, prefixes)
-
-                # Skip empty containers after filtering
-                if isinstance(value, (dict, list)) and len(value) == 0:
-                    continue
-
-                result[clean_key] = value
-
-            return result if result else {}
-
-        elif isinstance(data, list):
-            return self._remove_prefixes_from_list(data, prefixes)
-
-        return data
-
-    def _remove_prefixes_from_list(self, data, prefixes):
-        result = []
-        for item in data:
-            if isinstance(item, dict):
-                parsed = self._remove_prefixes(item, prefixes)
-                if parsed:
-                    result.append(parsed)
-            else:
-                result.append(item)
-        return result if result else []
+    def _clean_key(self, key):
+        # Force-strip m_ prefix when followed by lowercase
+        # e.g. m_modifierProvidedByAura -> modifierProvidedByAura
+        if key.startswith('m_') and len(key) > 2:
+            return key[2:]
+        return key
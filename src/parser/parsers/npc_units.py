@@ -1,10 +1,32 @@
+import functools
+import re
+from typing import NamedTuple
+
 from loguru import logger
 import utils.json_utils as json_utils
 import utils.num_utils as num_utils
+import utils.string_utils as string_utils
 from utils.num_utils import convert_engine_units_to_meters
 from . import weapon_parser
 
 
+# Number of raw key names whose classification is cached, well above the few hundred distinct keys in npc_units
+KEY_CACHE_SIZE = 4096
+
+
+class KeyClass(NamedTuple):
+    """How a raw key of npc_units is handled, see NpcParser._classify_key"""
+
+    clean_key: str
+    blocked: bool
+    is_distance: bool
+
+
+def _compile_substrings(substrings):
+    """Compile a pattern that searches for any of the substrings"""
+    return re.compile('|'.join(re.escape(substring) for substring in substrings))
+
+
 class NpcParser:
     """
     Parses npc_units.vdata generically.
@@ -67,6 +89,16 @@ class NpcParser:
         # e.g. "Effectiveness" contains "Effect"
         self.KEY_ALLOWLIST = ['Effectiveness', 'AffectedBy', 'HitWindow']
 
+        # The same few hundred key names repeat throughout the data, so the lists above are
+        # compiled once and the classification of each key is cached
+        # A prefix is only stripped if something remains after it, otherwise the next prefix is tried
+        self._prefix_stripper = string_utils.PrefixStripper(self.PREFIXES, require_uppercase=False, cache_size=KEY_CACHE_SIZE)
+        self._distance_pattern = _compile_substrings(self.DISTANCE_KEYWORDS)
+        self._distance_exclude_pattern = _compile_substrings(self.DISTANCE_EXCLUDE_KEYWORDS)
+        self._blocklist_pattern = _compile_substrings(self.KEY_BLOCKLIST)
+        self._allowlist_pattern = _compile_substrings(self.KEY_ALLOWLIST)
+        self._classify_key = functools.lru_cache(maxsize=KEY_CACHE_SIZE)(self._classify_key)
+
     def run(self, strict=False):
         all_npcs = {}
 
@@ -104,6 +136,8 @@ class NpcParser:
                 if strict:
                     raise e
 
+        cache_info = self._classify_key.cache_info()
+        logger.trace(f'NPC key classifier: {cache_info.hits} hits, {cache_info.misses} misses, {cache_info.currsize} keys cached')
         return all_npcs
 
     def _recursive_parse(self, data):
@@ -130,10 +164,11 @@ class NpcParser:
                 if key == 'm_vecScriptValues' or key in ['_class', '_my_subclass_name', '_base', '_not_pickable']:
                     continue
 
-                clean_key = self._clean_key_name(key)
+                key_class = self._classify_key(key)
+                clean_key = key_class.clean_key
 
                 # Check Blocklist
-                if self._is_blocked(clean_key):
+                if key_class.blocked:
                     continue
 
                 # Special handling for WeaponInfo - parse using shared weapon parser
@@ -144,7 +179,7 @@ class NpcParser:
                 parsed_val = self._recursive_parse(value)
 
                 # Post-process value (Unit conversion)
-                parsed_val = self._post_process_value(clean_key, parsed_val)
+                parsed_val = self._post_process_value(key_class, parsed_val)
 
                 # Add to result if it's a valid value
                 # We filter out None, and empty dictionaries/lists (pruning)
@@ -186,18 +221,23 @@ class NpcParser:
             # Base value (int, float, bool)
             return num_utils.assert_number(data)
 
+    def _classify_key(self, key):
+        """
+        Classify a raw key, eg. m_flAttackRange, by its name without prefixes, whether it is blocked,
+        and whether its value is a distance. Cached per key name, see __init__
+        """
+        clean_key = self._clean_key_name(key)
+        is_distance = self._distance_pattern.search(clean_key) is not None and self._distance_exclude_pattern.search(clean_key) is None
+        return KeyClass(clean_key, self._is_blocked(clean_key), is_distance)
+
     def _is_blocked(self, key):
         """Returns True if the key should be ignored based on the blocklist."""
         # Check allowlist first
-        for allowed in self.KEY_ALLOWLIST:
-            if allowed in key:
-                return False
+        if self._allowlist_pattern.search(key):
+            return False
 
         # Check blocklist
-        for blocked in self.KEY_BLOCKLIST:
-            if blocked in key:
-                return True
-        return False
+        return self._blocklist_pattern.search(key) is not None
 
     def _is_valid_value(self, value):
         """
@@ -213,19 +253,15 @@ class NpcParser:
 
     def _clean_key_name(self, key):
         """Removes Hungarian notation prefixes."""
-        for prefix in self.PREFIXES:
-            if key.startswith(prefix):
-                # Ensure we don't strip the whole key if it is just the prefix (unlikely)
-                if len(key) > len(prefix):
-                    return key[len(prefix) :]
-        return key
-
-    def _post_process_value(self, key, value):
+        # Ensure we don't strip the whole key if it is just the prefix (unlikely)
+        return self._prefix_stripper.strip(key)
+
+    def _post_process_value(self, key_class, value):
         """
         Converts engine units to meters if the key suggests it's a distance.
         """
         if isinstance(value, (int, float)) and not isinstance(value, bool):
-            if any(k in key for k in self.DISTANCE_KEYWORDS) and not any(ex in key for ex in self.DISTANCE_EXCLUDE_KEYWORDS):
+            if key_class.is_distance:
                 return convert_engine_units_to_meters(value)
         return value
 
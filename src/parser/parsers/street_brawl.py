@@ -46,11 +46,13 @@ class StreetBrawlParser:
     # None/empty value that could legitimately appear in the parsed data.
     _NO_DIFF = object()
 
-    def __init__(self, heroes_data, abilities_data, base_abilities, localizations):
+    def __init__(self, heroes_data, abilities_data, base_abilities, localizations, overridden_abilities):
         self.heroes_data = heroes_data
         self.abilities_data = abilities_data
         self.base_abilities = base_abilities
         self.localizations = localizations
+        # keys of the abilities with a Street Brawl override, see AbilityIndex
+        self.overridden_abilities = overridden_abilities
 
     def run(self):
         return {
@@ -64,8 +66,11 @@ class StreetBrawlParser:
         """
         Re-parse abilities with Street Brawl overrides swapped in, then keep
         only the values that differ from the normal parse.
+
+        Abilities are parsed independently of each other, so only the few that
+        have an override are copied and re-parsed, as the rest cannot differ.
         """
-        brawl_raw = json_utils.wrap_case_insensitive(self._apply_overrides(self.abilities_data))
+        brawl_raw = json_utils.CaseInsensitiveView({key: self._apply_overrides(self.abilities_data[key]) for key in self.overridden_abilities})
         brawl_abilities = AbilityParser(brawl_raw, self.heroes_data, self.localizations).run()
 
         changes = {}
@@ -89,7 +94,7 @@ class StreetBrawlParser:
         """
         Deep-copy the raw ability tree into plain dicts, replacing each base
         value with its Street Brawl override where one is present. Returns
-        plain dicts so the result can be re-wrapped case-insensitively without
+        plain dicts so the result can be viewed case-insensitively without
         depending on deepcopy semantics of CaseInsensitiveDict.
         """
         if isinstance(node, dict):
@@ -0,0 +1,98 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from loguru import logger
+
+
+class ParseStage:
+    """
+    A single step of Parser.run, along with the shared data it touches
+
+    Args:
+        name (str): Unique name of the stage. Its return value is stored under this name
+        func (callable): Function to run, called with the results of each stage in `args`
+        args (list[str], optional): Names of earlier stages whose results are passed to `func`, in order
+        reads (list[str], optional): Shared resources the stage reads, eg. 'scripts.heroes' or 'localizations'
+        writes (list[str], optional): Shared resources the stage mutates in place
+    """
+
+    def __init__(self, name, func, args=(), reads=(), writes=()):
+        self.name = name
+        self.func = func
+        self.args = list(args)
+        # a stage's result is itself a resource, which is read by any stage that takes it as an arg
+        self.reads = set(reads) | set(args)
+        self.writes = set(writes) | {name}
+
+
+def resolve_dependencies(stages):
+    """
+    Build the dependency graph for a list of stages, given in the order they would run serially.
+
+    A stage depends on every earlier stage that writes a resource it reads or writes, or that reads
+    a resource it writes. Running the stages in any order that respects these dependencies
+    therefore gives the same result as running them serially.
+
+    Returns:
+        dict[str, set[str]]: stage name -> names of the stages it must wait for
+    """
+    dependencies = {}
+    for index, stage in enumerate(stages):
+        if stage.name in dependencies:
+            raise Exception(f'Duplicate parse stage "{stage.name}"')
+
+        dependencies[stage.name] = set()
+        for previous in stages[:index]:
+            if previous.writes & (stage.reads | stage.writes) or previous.reads & stage.writes:
+                dependencies[stage.name].add(previous.name)
+
+    return dependencies
+
+
+def run_stages(stages, jobs=1):
+    """
+    Run a list of parse stages, running independent stages concurrently when jobs > 1
+
+    Args:
+        stages (list[ParseStage]): Stages in the order they would run serially
+        jobs (int, optional): Maximum number of stages to run at the same time. Defaults to 1
+
+    Returns:
+        dict[str, Any]: stage name -> value returned by the stage
+    """
+    dependencies = resolve_dependencies(stages)
+    results = {}
+
+    if jobs <= 1:
+        for stage in stages:
+            results[stage.name] = _run_stage(stage, [results[arg] for arg in stage.args])
+        return results
+
+    pending = list(stages)
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            # submit every stage whose dependencies have all finished, keeping the serial order
+            for stage in [s for s in pending if dependencies[s.name].issubset(results)]:
+                pending.remove(stage)
+                running[executor.submit(_run_stage, stage, [results[arg] for arg in stage.args])] = stage
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    results[stage.name] = future.result()
+                except Exception:
+                    # let already running stages finish, but do not start any new ones
+                    for other in running:
+                        other.cancel()
+                    raise
+
+    return results
+
+
+def _run_stage(stage, args):
+    start = time.perf_counter()
+    result = stage.func(*args)
+    logger.trace(f'Finished parse stage "{stage.name}" in {time.perf_counter() - start:.2f}s')
+    return result
@@ -0,0 +1,54 @@
+import os
+import threading
+from collections.abc import Mapping
+
+from loguru import logger
+
+from utils import binary_utils, json_utils
+
+
+class VDataStore(Mapping):
+    """
+    Read-only mapping of decompiled vdata scripts, eg. store['abilities'], where each file is only
+    read the first time it is accessed. The entries within each file are wrapped case-insensitively
+    on first access as well, see json_utils.LazyCaseInsensitiveDict.
+
+    Args:
+        scripts_dir (str): Directory of decompiled scripts, in either json or binary format
+    """
+
+    def __init__(self, scripts_dir):
+        self.paths = {}
+        for file_name in os.listdir(scripts_dir):
+            if file_name.endswith('.json') or file_name.endswith('.bin'):
+                # path/to/scripts/abilities.json -> abilities
+                key = file_name.split('.')[0]
+                self.paths[key] = os.path.join(scripts_dir, file_name)
+
+        self._scripts = {}
+        # parse stages can run concurrently, so make sure each file is only loaded once
+        self._locks = {key: threading.Lock() for key in self.paths}
+
+    def __getitem__(self, key):
+        script = self._scripts.get(key)
+        if script is not None:
+            return script
+
+        with self._locks[key]:
+            if key not in self._scripts:
+                self._scripts[key] = self._load(self.paths[key])
+                logger.trace(f'Loaded vdata script "{key}"')
+        return self._scripts[key]
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def _load(self, path):
+        if path.endswith('.bin'):
+            raw = binary_utils.read(path)
+        else:
+            raw = json_utils.read(path)
+        return json_utils.LazyCaseInsensitiveDict(raw)
@@ -10,7 +10,9 @@ fi
 if [ -d "$GAME_DIR/.git" ]; then
     echo "Updating existing GameTracking-Deadlock repository in $GAME_DIR"
     cd $GAME_DIR
-    git stash
+    # the checkout is only ever read from, so discard any local changes that would stop the pull,
+    # eg. files that older versions modified in place
+    git reset --hard
     git pull
     cd ..
 else
@@ -0,0 +1,59 @@
+import marshal
+import os
+import struct
+
+import zstandard
+
+# Bump when the layout of binary files changes, so files written by older versions are rejected
+FORMAT_VERSION = 1
+
+# magic bytes, FORMAT_VERSION, marshal version
+# marshal's format can change between python versions, so it is part of the header too
+HEADER = struct.Struct('<4sHH')
+MAGIC = b'DBIN'
+
+
+def write(path, data):
+    """
+    Write plain python data (dicts, lists, strings, numbers, bools and None) to a compact
+    zstd-compressed binary file, which is much faster to load than indented json
+
+    Args:
+        path (str): Path of the file to write, conventionally ending in .bin
+        data: Data to write
+    """
+    payload = zstandard.ZstdCompressor().compress(marshal.dumps(data))
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, marshal.version))
+        f.write(payload)
+
+
+def read(path):
+    """
+    Read a file written by write
+
+    Raises:
+        Exception: If the file was written by an incompatible version of deadbot or python
+    """
+    with open(path, 'rb') as f:
+        if not _is_current_header(f.read(HEADER.size)):
+            raise Exception(f'{path} was written by an incompatible version of deadbot or python, decompile again with --force')
+
+        return marshal.loads(zstandard.ZstdDecompressor().decompress(f.read()))
+
+
+def is_current(path):
+    """Check if a file was written by this version of the binary format, without reading the data"""
+    try:
+        with open(path, 'rb') as f:
+            return _is_current_header(f.read(HEADER.size))
+    except FileNotFoundError:
+        return False
+
+
+def _is_current_header(header):
+    if len(header) != HEADER.size:
+        return False
+    return HEADER.unpack(header) == (MAGIC, FORMAT_VERSION, marshal.version)
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import shutil
+
+from loguru import logger
+
+from utils import json_utils
+from utils.file_utils import hash_file
+from utils.meta_utils import get_deadbot_version
+
+# Bump when the manifest layout changes so old caches are ignored rather than misread
+CACHE_FORMAT_VERSION = 2
+
+
+def list_files(paths):
+    """
+    Expand a list of file and directory paths into a sorted list of absolute file paths.
+    Paths that do not exist are skipped, so optional inputs can be listed unconditionally.
+    """
+    files = set()
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isfile(path):
+            files.add(path)
+            continue
+
+        for root, _, file_names in os.walk(path):
+            for file_name in file_names:
+                files.add(os.path.join(root, file_name))
+
+    return sorted(files)
+
+
+class BuildCache:
+    """
+    Persistent content-hash cache for the stages of the deadbot pipeline.
+
+    Each stage records a digest of its inputs (file contents, parameters and the deadbot
+    version) along with the hash of every file it produced. When a later run sees the same
+    input digest, the stage is skipped and any output that is missing or has been modified
+    is restored from the cache's object store. Outputs whose size and modification time are
+    the same as when they were recorded are assumed unmodified, rather than hashed again.
+
+    Layout of the cache directory:
+        manifest.json     - stage name -> {'inputs': digest, 'outputs': {path: {'hash', 'size', 'mtime_ns'}}}
+        objects/ab/abcd.. - content-addressed copies of every recorded output file
+
+    Args:
+        cache_dir (str): Directory to store the manifest and cached outputs in
+        force (bool): If true, every lookup misses so each stage runs, though outputs are still recorded
+    """
+
+    def __init__(self, cache_dir, force=False):
+        self.cache_dir = cache_dir
+        self.force = force
+        self.manifest_path = os.path.join(self.cache_dir, 'manifest.json')
+        self.objects_dir = os.path.join(self.cache_dir, 'objects')
+        self.manifest = self._load_manifest()
+
+    def stage(self, name, inputs, outputs, params=None):
+        """
+        Create a cache entry for a single pipeline stage
+
+        Args:
+            name (str): Unique name of the stage, eg. 'parse'
+            inputs (list[str]): Files and directories whose contents the stage depends on
+            outputs (list[str]): Files and directories the stage writes to
+            params (dict, optional): Any other values that affect the stage's output, eg. cli flags
+
+        Returns:
+            BuildStage
+        """
+        return BuildStage(self, name, inputs, outputs, params or {})
+
+    def _load_manifest(self):
+        manifest = json_utils.read(self.manifest_path, ignore_error=True)
+        if manifest is None or manifest.get('Version') != CACHE_FORMAT_VERSION:
+            return {}
+
+        return manifest.get('Stages', {})
+
+    def _save_manifest(self):
+        json_utils.write(self.manifest_path, {'Version': CACHE_FORMAT_VERSION, 'Stages': self.manifest})
+        self._prune_objects()
+
+    def _object_path(self, file_hash):
+        return os.path.join(self.objects_dir, file_hash[:2], file_hash)
+
+    def _store_object(self, path, file_hash):
+        object_path = self._object_path(file_hash)
+        if os.path.exists(object_path):
+            return
+
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        # copy to a temp file first so an interrupted run never leaves a truncated object behind
+        shutil.copyfile(path, object_path + '.tmp')
+        os.replace(object_path + '.tmp', object_path)
+
+    def _prune_objects(self):
+        """Remove any stored object that is no longer referenced by a stage"""
+        referenced = {output['hash'] for entry in self.manifest.values() for output in entry['outputs'].values()}
+        for object_path in list_files([self.objects_dir]):
+            if os.path.basename(object_path) not in referenced:
+                os.remove(object_path)
+
+
+class BuildStage:
+    """
+    A single stage within a BuildCache. Typical usage:
+
+        stage = build_cache.stage('parse', inputs=[work_dir], outputs=[output_dir + '/json'])
+        if not stage.restore():
+            run_parser()
+            stage.save()
+    """
+
+    def __init__(self, cache, name, inputs, outputs, params):
+        self.cache = cache
+        self.name = name
+        self.outputs = outputs
+        # absolute path -> hash of each input file, so the stage itself does not need to hash them again
+        self.input_hashes = {path: hash_file(path) for path in list_files(inputs)}
+        self.input_digest = self._hash_inputs(params)
+
+    def _hash_inputs(self, params):
+        digest = hashlib.sha256()
+        digest.update(json.dumps({'DeadbotVersion': get_deadbot_version(), 'Params': params}, sort_keys=True).encode('utf-8'))
+        for path, file_hash in self.input_hashes.items():
+            digest.update(path.encode('utf-8'))
+            digest.update(file_hash.encode('utf-8'))
+        return digest.hexdigest()
+
+    def restore(self):
+        """
+        Check if the stage's inputs match the cached entry, and if so, restore its outputs
+
+        Returns:
+            bool: True if the stage can be skipped
+        """
+        if self.cache.force:
+            return False
+
+        entry = self.cache.manifest.get(self.name)
+        if entry is None or entry['inputs'] != self.input_digest:
+            logger.trace(f'[build-cache] Inputs changed for stage "{self.name}"')
+            return False
+
+        # ensure every output can be restored before touching any of them
+        for output in entry['outputs'].values():
+            if not os.path.exists(self.cache._object_path(output['hash'])):
+                logger.trace(f'[build-cache] Missing cached output for stage "{self.name}"')
+                return False
+
+        restored = 0
+        updated = False
+        for path, output in entry['outputs'].items():
+            stat = _stat(path)
+            if stat is not None and stat == (output['size'], output['mtime_ns']):
+                continue
+
+            if stat is None or hash_file(path) != output['hash']:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                shutil.copyfile(self.cache._object_path(output['hash']), path)
+                restored += 1
+
+            # the file was touched or restored, so record its new stat to not hash it again on the next run
+            output['size'], output['mtime_ns'] = _stat(path)
+            updated = True
+
+        if updated:
+            self.cache._save_manifest()
+
+        logger.trace(f'[build-cache] Stage "{self.name}" is up to date, restored {restored}/{len(entry["outputs"])} output files')
+        return True
+
+    def save(self):
+        """Record the stage's inputs and store a copy of its current outputs"""
+        outputs = {}
+        for path in list_files(self.outputs):
+            file_hash = hash_file(path)
+            self.cache._store_object(path, file_hash)
+            size, mtime_ns = _stat(path)
+            outputs[path] = {'hash': file_hash, 'size': size, 'mtime_ns': mtime_ns}
+
+        self.cache.manifest[self.name] = {'inputs': self.input_digest, 'outputs': outputs}
+        self.cache._save_manifest()
+        logger.trace(f'[build-cache] Saved {len(outputs)} output files for stage "{self.name}"')
+
+
+def _stat(path):
+    """Returns the size and modification time of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
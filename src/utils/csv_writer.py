@@ -1,25 +1,106 @@
 import csv
-import json
 import os
 
+from utils import file_utils, json_utils
 
-def export_json_file_to_csv(file_name, OUTPUT_DIR):
+# Joins the keys of nested values into a single column, eg. {"Weapon": {"DPS": 10}} -> Weapon.DPS
+COLUMN_SEPARATOR = '.'
+
+
+def export_json_dir_to_csv(OUTPUT_DIR, profile='pretty'):
+    """Export every json file of parsed data, ie. json/*.json, to csv/, see export_json_file_to_csv"""
+    json_dir = f'{OUTPUT_DIR}/json'
+    if not os.path.isdir(json_dir):
+        return
+
+    for file_name in sorted(os.listdir(json_dir)):
+        if file_name.endswith('.json'):
+            export_json_file_to_csv(file_name[: -len('.json')], OUTPUT_DIR, profile)
+
+
+def export_json_file_to_csv(file_name, OUTPUT_DIR, profile='pretty'):
+    """
+    Export a json file of rows, eg. json/item-data.json, to csv/item-data.csv
+
+    Each top level entry is a row, keyed by the first column. Nested values are flattened into a column
+    for each of their paths, eg. Weapon.DPS, with lists of plain values joined into a single column.
+    The json is streamed twice, see json_utils.iter_entries, once to find the columns, then again to
+    flatten and write each row, so neither the json nor the csv is ever held in memory as a whole.
+
+    Args:
+        profile (str, optional): One of json_utils.OUTPUT_PROFILES. The csv is the same for each,
+            though compact+zstd also writes a compressed copy of it
+    """
     os.makedirs(f'{OUTPUT_DIR}/json', exist_ok=True)
-    with open(f'{OUTPUT_DIR}/json/{file_name}.json') as f:
-        data = json.load(f)
+    json_path = f'{OUTPUT_DIR}/json/{file_name}.json'
 
     os.makedirs(f'{OUTPUT_DIR}/csv', exist_ok=True)
-    if data:
-        all_keys = dict.fromkeys(k for row in data.values() for k in row.keys())
-        fieldnames = [''] + list(all_keys)
-        with open(f'{OUTPUT_DIR}/csv/{file_name}.csv', 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
-            writer.writeheader()
-            for row_key, row in data.items():
-                writer.writerow({'': row_key, **{k: convert_array_to_string(v) for k, v in row.items()}})
+    # keys of a dict are used to keep the columns in the order they are first found
+    columns = {}
+    has_rows = False
+    for _, row in json_utils.iter_entries(json_path):
+        has_rows = True
+        for column in _get_columns(row, ''):
+            columns.setdefault(column, None)
+
+    if not has_rows:
+        return
+
+    path = f'{OUTPUT_DIR}/csv/{file_name}.csv'
+    with file_utils.open_if_changed(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=[''] + list(columns))
+        writer.writeheader()
+        # files such as soul-unlock-data are a list of rows, which are keyed by index
+        for row_key, row in json_utils.iter_entries(json_path):
+            writer.writerow({'': row_key, **dict(_flatten(row, ''))})
+
+    if profile == 'compact+zstd':
+        file_utils.compress_file(path, path + '.zst')
+    elif os.path.exists(path + '.zst'):
+        # left over from a run with another profile, and no longer matches the file
+        os.remove(path + '.zst')
+
+
+def _get_columns(value, path):
+    """Yields the column of each value that _flatten would yield for the given value"""
+    if _is_nested(value):
+        for key, child in _get_children(value):
+            yield from _get_columns(child, _join(path, key))
+    else:
+        # a row that is a plain value is kept in a single column
+        yield path or 'Value'
+
+
+def _flatten(value, path):
+    """Yields the column and csv value of each plain value within a value, eg. ('Weapon.DPS', 10)"""
+    if _is_nested(value):
+        for key, child in _get_children(value):
+            yield from _flatten(child, _join(path, key))
+    else:
+        yield path or 'Value', convert_array_to_string(value)
+
+
+def _is_nested(value):
+    """Whether a value is flattened into a column for each of its children, rather than kept in a single column"""
+    if isinstance(value, dict):
+        return len(value) > 0
+    if isinstance(value, list):
+        return any(isinstance(item, (dict, list)) for item in value)
+    return False
+
+
+def _get_children(value):
+    return value.items() if isinstance(value, dict) else enumerate(value)
+
+
+def _join(path, key):
+    return f'{path}{COLUMN_SEPARATOR}{key}' if path else str(key)
 
 
 def convert_array_to_string(value):
     if isinstance(value, list):
         return ', '.join(str(v) for v in value)
+    # empty dicts are the only dicts that are not flattened
+    if isinstance(value, dict):
+        return ''
     return value
@@ -1,3 +1,21 @@
+import contextlib
+import hashlib
+import os
+import threading
+
+import zstandard
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Outputs are compressed once and archived, so favour size over speed
+ZSTD_LEVEL = 19
+# Maximum size of a trained dictionary, which zstd recommends be about 1/100th of the data it is trained on
+ZSTD_DICT_SIZE = 1024 * 1024
+# Files are split into samples of this size to train a dictionary on, up to ZSTD_DICT_SAMPLES_SIZE in total
+ZSTD_DICT_SAMPLE_SIZE = 4096
+ZSTD_DICT_SAMPLES_SIZE = 32 * 1024 * 1024
+
+
 def read(path):
     with open(path, 'r', encoding='utf8') as f:
         return f.read()
@@ -6,3 +24,118 @@ def read(path):
 def write(path, data):
     with open(path, 'w', encoding='utf8') as f:
         f.write(data)
+
+
+def hash_file(path):
+    """Return the sha256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_if_changed(path, content):
+    """
+    Atomically write bytes to a file, unless the file already has the same contents.
+    The file is written to a temporary file next to it and renamed over it, so it is never left half-written.
+
+    Args:
+        path (str): Path of the file to write
+        content (bytes): Contents of the file
+
+    Returns:
+        bool: False if the file was already up to date and was left untouched
+    """
+    # only hash the existing file if its size matches, as any other file has changed
+    if os.path.isfile(path) and os.path.getsize(path) == len(content):
+        if hash_file(path) == hashlib.sha256(content).hexdigest():
+            return False
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = _get_temp_path(path)
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return True
+
+
+@contextlib.contextmanager
+def open_if_changed(path, mode='wb', **kwargs):
+    """
+    Open a temporary file to stream the contents of a file to, for files too large to build in memory for
+    write_if_changed. Once closed, the temporary file atomically replaces the file, unless the file already
+    has the same contents, in which case it is left untouched. Eg.
+        with file_utils.open_if_changed(path, 'w', encoding='utf-8') as f:
+            f.write(...)
+
+    Args:
+        path (str): Path of the file to write
+        mode (str, optional): Mode to open the temporary file with, either 'w' or 'wb'
+        kwargs: Passed on to open, eg. encoding
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = _get_temp_path(path)
+    try:
+        with open(temp_path, mode, **kwargs) as f:
+            yield f
+
+        if os.path.isfile(path) and os.path.getsize(path) == os.path.getsize(temp_path) and hash_file(path) == hash_file(temp_path):
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _get_temp_path(path):
+    # unique to the thread, so concurrent writes of the same file do not share a temporary file
+    return f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+
+def compress(content, zstd_dict=None):
+    """
+    Compress bytes with zstd
+
+    Args:
+        content (bytes): Bytes to compress
+        zstd_dict (zstandard.ZstdCompressionDict, optional): Dictionary to compress with, see train_zstd_dictionary
+    """
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=zstd_dict).compress(content)
+
+
+def compress_file(path, compressed_path):
+    """Compress a file with zstd to compressed_path, streaming it rather than reading it into memory, see open_if_changed"""
+    with open(path, 'rb') as source, open_if_changed(compressed_path) as destination:
+        zstandard.ZstdCompressor(level=ZSTD_LEVEL).copy_stream(source, destination)
+
+
+def train_zstd_dictionary(contents):
+    """
+    Train a zstd dictionary on the contents of a set of similar files, which compresses each of them
+    better than they compress on their own. The same dictionary is needed to decompress them
+
+    Args:
+        contents (list[bytes]): Contents of each file
+
+    Returns:
+        zstandard.ZstdCompressionDict: Trained dictionary, or None if there is too little data to train one
+    """
+    samples = [content[i : i + ZSTD_DICT_SAMPLE_SIZE] for content in contents for i in range(0, len(content), ZSTD_DICT_SAMPLE_SIZE)]
+    # spread the samples evenly across every file if there are too many
+    step = max(len(samples) * ZSTD_DICT_SAMPLE_SIZE // ZSTD_DICT_SAMPLES_SIZE, 1)
+    samples = samples[::step]
+
+    dict_size = min(ZSTD_DICT_SIZE, sum(len(sample) for sample in samples) // 100)
+    if len(contents) < 2 or dict_size < ZSTD_DICT_SAMPLE_SIZE:
+        return None
+
+    return zstandard.train_dictionary(dict_size, samples)
@@ -1,7 +1,13 @@
 import json
 import os
+import re
+import threading
+from collections.abc import ItemsView, ValuesView
+from concurrent.futures import ThreadPoolExecutor
 
-from utils import num_utils
+from loguru import logger
+
+from utils import file_utils, num_utils
 
 
 class CaseInsensitiveDict(dict):
@@ -118,6 +124,277 @@ class CaseInsensitiveDict(dict):
         self.update(other)
         return self
 
+    def __reduce__(self):
+        # rebuild through __init__ when pickled or deep-copied, as by default items are
+        # restored before _ci_index exists
+        return (type(self), (list(dict.items(self)),))
+
+
+class LazyCaseInsensitiveDict(CaseInsensitiveDict):
+    """A CaseInsensitiveDict whose nested dicts and lists are only wrapped with
+    ``wrap_case_insensitive`` the first time they are accessed.
+
+    Meant for the top level of large files such as abilities.json, where a run
+    may only look at a fraction of the entries. Values passed to the constructor
+    are wrapped lazily, values set afterwards are stored as-is, matching
+    CaseInsensitiveDict.
+
+    Iterating keys stays lazy, while ``items()``, ``values()`` and copies wrap
+    every remaining value first, so they always see the same data an eagerly
+    wrapped dict would hold.
+    """
+
+    def __init__(self, data=None, **kwargs):
+        # keys whose values have not been wrapped yet
+        self._pending = set()
+        super().__init__(data, **kwargs)
+        self._pending = {key for key, value in dict.items(self) if isinstance(value, (dict, list))}
+
+    def _actual_key(self, key):
+        if isinstance(key, str):
+            return self._ci_index.get(key.lower(), key)
+        return key
+
+    def _wrap(self, key):
+        # another thread may have wrapped the same value while this one waited for the lock, in which
+        # case theirs is kept so every caller ends up holding the same object. The wrapped value is
+        # stored before the key stops being pending, so a key that is not pending is always wrapped
+        with _LAZY_WRAP_LOCK:
+            if key in self._pending:
+                dict.__setitem__(self, key, wrap_case_insensitive(dict.__getitem__(self, key)))
+                self._pending.discard(key)
+
+    def _wrap_all(self):
+        for key in list(self._pending):
+            self._wrap(key)
+
+    def __getitem__(self, key):
+        # wrap before reading, as a value read first could be wrapped by another thread in the meantime
+        if self._pending:
+            actual = self._actual_key(key)
+            if actual in self._pending:
+                self._wrap(actual)
+        return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        self._pending.discard(self._actual_key(key))
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._pending.discard(self._actual_key(key))
+        super().__delitem__(key)
+
+    def __iter__(self):
+        # defined so that dict(d) and {**d} go through __getitem__ rather than copying unwrapped values
+        return dict.__iter__(self)
+
+    def items(self):
+        self._wrap_all()
+        return super().items()
+
+    def values(self):
+        self._wrap_all()
+        return super().values()
+
+    def clear(self):
+        self._pending.clear()
+        super().clear()
+
+    def popitem(self):
+        self._wrap_all()
+        return super().popitem()
+
+    def __reduce__(self):
+        return (_rebuild_lazy_case_insensitive_dict, (type(self), list(dict.items(self)), self._pending.copy()))
+
+
+def _rebuild_lazy_case_insensitive_dict(cls, items, pending):
+    # values that were already wrapped are restored as-is, rather than wrapped again on access
+    rebuilt = cls(items)
+    rebuilt._pending = pending
+    return rebuilt
+
+
+_LAZY_WRAP_LOCK = threading.Lock()
+
+
+class CaseInsensitiveView(dict):
+    """A read-only, case-insensitive view over a tree of plain dicts and lists,
+    with the same lookup semantics as ``wrap_case_insensitive`` but without
+    converting the whole tree up front.
+
+    A view only holds a shallow copy of its own node, and nested dicts are
+    turned into views of their own the first time they are accessed, so nodes
+    that are never looked at cost nothing. Nested lists become lists of views.
+    Rather than a ``_ci_index`` per node, nodes with the same keys share a single
+    lowercase-key index, as most vdata nodes repeat the same handful of keys.
+    The indexes are shared within a tree, and are freed along with it.
+
+    It subclasses dict so ``isinstance(node, dict)`` checks throughout the
+    parsers still hold, and compares and serializes like the source data. Any
+    attempt to modify it raises a TypeError, use ``copy()`` for a mutable
+    CaseInsensitiveDict.
+    """
+
+    __slots__ = ('_index', '_indexes')
+
+    def __init__(self, data, _indexes=None):
+        super().__init__(data)
+        # tuple of a node's keys -> lowercase-key index, shared by every view of the tree
+        self._indexes = {} if _indexes is None else _indexes
+        self._index = _get_shared_index(self._indexes, tuple(data))
+        if len(self._index) != dict.__len__(self):
+            # the last casing of a key wins, the same as a CaseInsensitiveDict built from the same data
+            dict.clear(self)
+            for key, value in data.items():
+                if self._index[key.lower() if isinstance(key, str) else key] == key:
+                    dict.__setitem__(self, key, value)
+
+    def __getitem__(self, key):
+        if not dict.__contains__(self, key):
+            actual = self._index.get(key.lower() if isinstance(key, str) else key)
+            if actual is None:
+                raise KeyError(key)
+            key = actual
+
+        value = dict.__getitem__(self, key)
+        if type(value) is dict or type(value) is list:
+            # first access to a nested node, swap it for its view so it is only converted once
+            value = _view(value, self._indexes)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or (isinstance(key, str) and key.lower() in self._index)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        # defined so that dict(view) and {**view} go through __getitem__ and also see views of nested nodes
+        return dict.__iter__(self)
+
+    def items(self):
+        return ItemsView(self)
+
+    def values(self):
+        return ValuesView(self)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({dict.__repr__(self)})'
+
+    def __reduce__(self):
+        return (type(self), (dict(dict.items(self)),))
+
+    def copy(self):
+        return CaseInsensitiveDict(self.items())
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(f'{type(self).__name__} is read-only')
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    pop = popitem = setdefault = update = clear = _read_only
+
+
+def _get_shared_index(indexes, keys):
+    index = indexes.get(keys)
+    if index is None:
+        index = indexes.setdefault(keys, {key.lower() if isinstance(key, str) else key: key for key in keys})
+    return index
+
+
+def _view(value, indexes):
+    if isinstance(value, dict):
+        return CaseInsensitiveView(value, indexes)
+    if isinstance(value, list):
+        return [_view(item, indexes) for item in value]
+    return value
+
+
+class CaseInsensitiveChain:
+    """A read-only, case-insensitive lookup over several mappings at once, without merging them.
+
+    Later mappings take priority, so ``chain[key]`` gives the same result as
+    updating a CaseInsensitiveDict with each mapping in turn and then looking
+    the key up, but only probes each mapping until the key is found.
+
+    Mappings that keep their own lowercase-key index, eg. a language's LocalizationDelta,
+    are looked up through its ``get_lowercase_index()``, see build_lowercase_index.
+    Other large mappings are indexed once per chain, so they should not be modified
+    while the chain is in use.
+    """
+
+    def __init__(self, *mappings):
+        # probe in reverse, as the last mapping takes priority
+        self.mappings = mappings[::-1]
+        # position of a large mapping within self.mappings -> its lowercase-key index, built when first needed
+        self._indexes = {}
+
+    def _find(self, key):
+        for position, mapping in enumerate(self.mappings):
+            if isinstance(mapping, (CaseInsensitiveDict, CaseInsensitiveView)):
+                if key in mapping:
+                    return True, mapping[key]
+                continue
+
+            actual = self._find_case_insensitive_key(position, mapping, key)
+            if actual is not _MISSING:
+                return True, mapping[actual]
+
+        return False, None
+
+    def _find_case_insensitive_key(self, position, mapping, key):
+        """Find the actual casing of key in a plain mapping, or _MISSING. The last casing wins, like CaseInsensitiveDict"""
+        if not isinstance(key, str):
+            return key if key in mapping else _MISSING
+
+        lower = key.lower()
+        if hasattr(mapping, 'get_lowercase_index'):
+            return mapping.get_lowercase_index().get(lower, _MISSING)
+
+        if len(mapping) < _MIN_INDEXED_SIZE:
+            actual = _MISSING
+            for candidate in mapping:
+                if isinstance(candidate, str) and candidate.lower() == lower:
+                    actual = candidate
+            return actual
+
+        index = self._indexes.get(position)
+        if index is None:
+            index = self._indexes[position] = build_lowercase_index(mapping)
+        return index.get(lower, _MISSING)
+
+    def __contains__(self, key):
+        return self._find(key)[0]
+
+    def __getitem__(self, key):
+        found, value = self._find(key)
+        if not found:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        found, value = self._find(key)
+        return value if found else default
+
+
+_MISSING = object()
+
+# Mappings smaller than this are scanned for a key, rather than indexed
+_MIN_INDEXED_SIZE = 256
+
+
+def build_lowercase_index(mapping):
+    """
+    Map the lowercase of each string key of a mapping to the key itself, where the last casing wins, like CaseInsensitiveDict.
+    A mapping that is looked up case-insensitively many times, eg. by CaseInsensitiveChain, can keep one of these
+    and return it from get_lowercase_index(), as long as it is rebuilt whenever the mapping changes
+    """
+    return {key.lower(): key for key in mapping if isinstance(key, str)}
+
 
 def wrap_case_insensitive(obj):
     """Recursively wrap dict-trees in CaseInsensitiveDict."""
@@ -150,18 +427,247 @@ def read(path, ignore_error=False):
         raise e
 
 
-def write(path, data):
+# Characters read from a file at a time by iter_entries
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def iter_entries(path, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Read the top level entries of a JSON file one at a time, rather than reading the whole file to memory,
+    so only a single entry is held at once.
+
+    Args:
+        path (str): The path to the JSON file, which must hold an object or an array
+        chunk_size (int, optional): Number of characters to read at a time
+    Yields:
+        tuple: The key and value of each entry of an object, or the index and value of each item of an array
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        stream = _JsonStream(f, chunk_size)
+        closing = '}' if stream.expect('{[') == '{' else ']'
+
+        if stream.peek() == closing:
+            stream.expect(closing)
+        else:
+            index = 0
+            while True:
+                if closing == '}':
+                    key = stream.decode()
+                    if not isinstance(key, str):
+                        raise json.JSONDecodeError('Expecting property name enclosed in double quotes', stream.buffer, stream.position)
+                    stream.expect(':')
+                else:
+                    key = index
+                    index += 1
+                yield key, stream.decode()
+
+                if stream.expect(',' + closing) == closing:
+                    break
+
+        if stream.peek() != '':
+            raise json.JSONDecodeError('Extra data', stream.buffer, stream.position)
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER = re.compile(r'[-+.0-9eE]*')
+
+
+class _JsonStream:
+    """Decodes JSON values one at a time from a file, only holding the part of the file that is being decoded"""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def peek(self):
+        """Returns the next character that is not whitespace, or '' at the end of the file"""
+        while True:
+            self.position = _WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer) or self.eof:
+                return self.buffer[self.position : self.position + 1]
+            self._read(self.chunk_size)
+
+    def expect(self, characters):
+        """Consume the next character that is not whitespace, which must be one of the given characters"""
+        character = self.peek()
+        if character == '' or character not in characters:
+            raise json.JSONDecodeError(f'Expecting one of {characters!r}', self.buffer, self.position)
+        self.position += 1
+        return character
+
+    def decode(self):
+        """Decode the next value, reading more of the file until the buffer holds all of it"""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # a number at the end of the buffer may continue in the part of the file not read yet,
+                # and the decoder stops early at a partly read fraction or exponent, eg. '1.' or '1e'
+                if self.eof or _NUMBER.match(self.buffer, self.position).end() < len(self.buffer):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # read ever larger chunks, so a large value is not decoded from scratch too many times
+            self._read(size)
+            size *= 2
+
+    def _read(self, size):
+        chunk = self.f.read(size)
+        self.eof = chunk == ''
+        # drop what was already decoded
+        self.buffer = self.buffer[self.position :] + chunk
+        self.position = 0
+
+
+# Formats that parsed output can be written in
+# pretty: indented, for readable diffs
+# compact: no indentation or spaces between separators
+# compact+zstd: compact, with a zstd compressed copy of each file alongside it, eg. hero-data.json.zst
+OUTPUT_PROFILES = ['pretty', 'compact', 'compact+zstd']
+
+
+def encode(data, profile='pretty'):
+    """
+    Serialize data to JSON bytes in one of OUTPUT_PROFILES
+    Args:
+        data (dict): The data to serialize.
+        profile (str, optional): Output profile. Defaults to 'pretty'.
+    Returns:
+        bytes: UTF-8 encoded JSON
+    """
+    # Use ensure_ascii=False to prevent Unicode characters from being escaped
+    if profile == 'pretty':
+        return json.dumps(data, indent=4, ensure_ascii=False).encode('utf-8')
+    if profile in ('compact', 'compact+zstd'):
+        return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+    raise Exception(f'Unknown output profile "{profile}", expected one of {OUTPUT_PROFILES}')
+
+
+def write(path, data, profile=None, zstd_dict=None):
     """
-    Write data to a JSON file.
+    Write data to a JSON file. The file is replaced atomically, and is left untouched if its contents
+    are unchanged. While an OutputWriter is active, the file is written in the background.
     Args:
         path (str): The path to the JSON file.
         data (dict): The data to write to the JSON file.
+        profile (str, optional): One of OUTPUT_PROFILES. Defaults to the profile of the active OutputWriter, or 'pretty'.
+        zstd_dict (zstandard.ZstdCompressionDict, optional): Dictionary to compress with for 'compact+zstd'.
     """
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    # Use encoding='utf-8' to prevent Unicode characters from being escaped
-    with open(path, 'w', encoding='utf-8') as outfile:
-        json.dump(data, outfile, indent=4, ensure_ascii=False)
+    if profile is None:
+        profile = _output_writer.profile if _output_writer is not None else 'pretty'
+
+    # Serialize straight away, as the caller may go on to modify the data
+    write_output(path, encode(data, profile), profile, zstd_dict)
+
+
+def write_output(path, content, profile=None, zstd_dict=None):
+    """
+    Write the already encoded contents of an output file, along with a compressed copy for 'compact+zstd'.
+    See write for the arguments
+    """
+    if profile is None:
+        profile = _output_writer.profile if _output_writer is not None else 'pretty'
+    compressed = profile == 'compact+zstd'
+
+    if _output_writer is not None:
+        _output_writer.submit(path, content, compressed, zstd_dict)
+    else:
+        _write_files(path, content, compressed, zstd_dict)
+
+
+def _write_files(path, content, compressed, zstd_dict):
+    """Returns the size and whether it changed of each file written"""
+    files = [(path, content)]
+    if compressed:
+        files.append((path + '.zst', file_utils.compress(content, zstd_dict)))
+    elif os.path.exists(path + '.zst'):
+        # left over from a run with another profile, and no longer matches the file
+        os.remove(path + '.zst')
+
+    return [(file_utils.write_if_changed(file_path, file_content), len(file_content)) for file_path, file_content in files]
+
+
+# OutputWriter that write() currently hands files to, if any
+_output_writer = None
+
+
+class OutputWriter:
+    """
+    While active, files written with write() are written in a background thread pool, so the
+    caller does not wait on the disk. Files whose contents are unchanged are not rewritten.
+
+    Used as a context manager, which waits for every file to be written on exit, then logs how
+    much was written and skipped. Eg.
+        with json_utils.OutputWriter():
+            parser.run()
+
+    Args:
+        max_workers (int, optional): Number of threads to write files with. Defaults to 4
+        profile (str, optional): One of OUTPUT_PROFILES to write files in. Defaults to 'pretty'
+    """
+
+    def __init__(self, max_workers=4, profile='pretty'):
+        if profile not in OUTPUT_PROFILES:
+            raise Exception(f'Unknown output profile "{profile}", expected one of {OUTPUT_PROFILES}')
+
+        self.max_workers = max(max_workers, 1)
+        self.profile = profile
+        self.files_written = 0
+        self.bytes_written = 0
+        self.files_skipped = 0
+        self.bytes_skipped = 0
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._futures = []
+
+    def __enter__(self):
+        global _output_writer
+        if _output_writer is not None:
+            raise Exception('Another OutputWriter is already active')
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='output-writer')
+        _output_writer = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _output_writer
+        _output_writer = None
+        self._executor.shutdown(wait=True)
+
+        errors = [future.exception() for future in self._futures if future.exception() is not None]
+        self._futures = []
+        # an exception from the block itself takes priority over failed writes
+        if errors and exc_type is None:
+            raise errors[0]
+
+        logger.info(
+            f'Wrote {self.files_written} files ({self.bytes_written:,} bytes), '
+            + f'skipped {self.files_skipped} unchanged files ({self.bytes_skipped:,} bytes)'
+        )
+
+    def submit(self, path, content, compressed=False, zstd_dict=None):
+        """Write bytes to a file in the background, and a zstd compressed copy if compressed is set"""
+        self._futures.append(self._executor.submit(self._write, path, content, compressed, zstd_dict))
+
+    def _write(self, path, content, compressed, zstd_dict):
+        files = _write_files(path, content, compressed, zstd_dict)
+        with self._lock:
+            for changed, size in files:
+                if changed:
+                    self.files_written += 1
+                    self.bytes_written += size
+                else:
+                    self.files_skipped += 1
+                    self.bytes_skipped += size
 
 
 # Remove keys from a dictionary at the specified depth
@@ -182,6 +688,82 @@ def remove_keys(data, keys_to_remove, depths_to_search=1):
     return data
 
 
+def transform_keys(data, rename_key, skip_key=None, prune_empty=False, recurse_lists=True):
+    """
+    Rewrite the keys of every dictionary in data, including dictionaries within lists, in a single
+    iterative pass, so deeply nested data is not limited by the recursion depth.
+    Items of lists that are not dictionaries are kept as they are.
+
+    Args:
+        data (dict | list): Data to rewrite, which is not modified
+        rename_key (callable): Returns the new key for a key
+        skip_key (callable, optional): Returns True for a key that should be removed along with its value
+        prune_empty (bool): Remove dictionaries and lists that are empty once rewritten
+        recurse_lists (bool): If False, lists within dictionaries are kept as they are, rather than rewriting
+            the dictionaries within them
+    Returns:
+        dict | list: Rewritten copy of data
+    """
+    if not isinstance(data, (dict, list)):
+        return data
+
+    # each frame is the remaining items of a container, its rewritten copy, and its key in the parent
+    stack = [_transform_frame(data, None)]
+    while True:
+        items, output, output_key = stack[-1]
+        for item in items:
+            if isinstance(output, dict):
+                key, value = item
+                if skip_key is not None and skip_key(key):
+                    continue
+                key = rename_key(key)
+                if isinstance(value, dict) or (recurse_lists and isinstance(value, list)):
+                    stack.append(_transform_frame(value, key))
+                    break
+                output[key] = value
+            else:
+                if isinstance(item, dict):
+                    stack.append(_transform_frame(item, None))
+                    break
+                output.append(item)
+        else:
+            # every item of the container is rewritten, so add it to its parent
+            stack.pop()
+            if not stack:
+                return output
+            if prune_empty and len(output) == 0:
+                continue
+
+            parent = stack[-1][1]
+            if isinstance(parent, dict):
+                parent[output_key] = output
+            else:
+                parent.append(output)
+
+
+def _transform_frame(container, key):
+    if isinstance(container, dict):
+        return iter(container.items()), {}, key
+    return iter(container), [], key
+
+
+def project(data, overrides):
+    """
+    Copy-on-write projection of a dictionary with some keys replaced. Every other value is shared
+    with the original rather than copied, so this is far cheaper than deep copying the dictionary
+    to change a few keys. Nested dictionaries that change must be projected themselves.
+
+    Args:
+        data (dict): Dictionary to project, which keeps its type, eg. CaseInsensitiveDict
+        overrides (dict): Keys to replace or add, with their new values
+    Returns:
+        dict: Shallow copy of data with the overrides applied
+    """
+    projection = data.copy()
+    projection.update(overrides)
+    return projection
+
+
 def sort_dict(dict):
     """Sorts a dictionary by its keys"""
     keys = list(dict.keys())
@@ -3,6 +3,7 @@ import argparse
 from typing import Optional, Protocol
 from dotenv import load_dotenv
 
+from utils.json_utils import OUTPUT_PROFILES
 from utils.meta_utils import get_deadbot_version
 from utils.string_utils import is_truthy
 
@@ -49,18 +50,48 @@ def arg_group_base(parser):
         help='Output directory (also set with OUTPUT_DIR environment variable)',
         default=os.getenv('OUTPUT_DIR', os.path.abspath(os.getcwd()) + '/output-data'),
     )
+    group_base.add_argument(
+        '--cachedir',
+        help='Directory for the build cache, used to skip stages whose inputs are unchanged (also set with CACHE_DIR environment variable)',
+        default=os.getenv('CACHE_DIR', os.path.abspath(os.getcwd()) + '/build-cache'),
+    )
+    group_base.add_argument(
+        '--binary-workdir',
+        action='store_true',
+        help='Decompile game data to a compact binary format instead of json, for faster parsing (also set with BINARY_WORKDIR env variable)',
+        default=is_truthy(os.getenv('BINARY_WORKDIR', False)),
+    )
     group_base.add_argument(
         '--english-only',
         action='store_true',
         help='Only parse for english localizations (also set with ENGLISH_ONLY environment variable)',
         default=is_truthy(os.getenv('ENGLISH_ONLY', False)),
     )
+    group_base.add_argument(
+        '--localization-deltas',
+        action='store_true',
+        help='Only output the localized strings that differ from english for other languages (also set with LOCALIZATION_DELTAS env variable)',
+        default=is_truthy(os.getenv('LOCALIZATION_DELTAS', False)),
+    )
+    group_base.add_argument(
+        '--output-profile',
+        choices=OUTPUT_PROFILES,
+        help='Format of parsed output, where compact+zstd also writes a compressed copy of each file (also set with OUTPUT_PROFILE env variable)',
+        default=os.getenv('OUTPUT_PROFILE', 'pretty'),
+    )
     group_base.add_argument(
         '--force',
         action='store_true',
-        help='Forces decompilation even if game files and workdir versions match',
+        help='Forces decompilation and parsing even if game files and workdir versions match, bypassing the build cache',
         default=is_truthy(os.getenv('FORCE', False)),
     )
+    group_base.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        help='Maximum number of files to decompile, parse stages or ability card languages to run at once (also set with JOBS env variable)',
+        default=int(os.getenv('JOBS', 1)),
+    )
     group_base.add_argument(
         '-v',
         '--verbose',
@@ -152,8 +183,13 @@ class Args(Protocol):
     workdir: str
     inputdir: str
     output: str
+    cachedir: str
+    binary_workdir: bool
     english_only: bool
+    localization_deltas: bool
+    output_profile: str
     force: bool
+    jobs: int
     verbose: bool
     import_files: bool
     decompile: bool
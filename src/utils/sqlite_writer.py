@@ -0,0 +1,368 @@
+import json
+import os
+import sqlite3
+
+from loguru import logger
+
+from utils import json_utils
+
+# Normalised tables for the parsed data. Every entity table also keeps the entity's full json in
+# `data`, for anything that is not broken out into columns, which can be queried with sqlite's json functions
+SCHEMA = """
+CREATE TABLE heroes (
+    key TEXT PRIMARY KEY,
+    name TEXT,
+    type TEXT,
+    is_disabled INTEGER,
+    in_development INTEGER,
+    is_selectable INTEGER,
+    data TEXT
+);
+CREATE TABLE hero_stats (
+    hero_key TEXT,
+    stat TEXT,
+    value,
+    PRIMARY KEY (hero_key, stat)
+);
+CREATE TABLE hero_abilities (
+    hero_key TEXT,
+    slot TEXT,
+    ability_key TEXT,
+    PRIMARY KEY (hero_key, slot)
+);
+CREATE TABLE abilities (
+    key TEXT PRIMARY KEY,
+    name TEXT,
+    is_disabled INTEGER,
+    data TEXT
+);
+CREATE TABLE ability_stats (
+    ability_key TEXT,
+    stat TEXT,
+    value,
+    PRIMARY KEY (ability_key, stat)
+);
+CREATE TABLE ability_scales (
+    ability_key TEXT,
+    stat TEXT,
+    position INTEGER,
+    value REAL,
+    type TEXT,
+    PRIMARY KEY (ability_key, stat, position)
+);
+CREATE TABLE ability_upgrades (
+    ability_key TEXT,
+    tier INTEGER,
+    stat TEXT,
+    value,
+    multiply INTEGER,
+    PRIMARY KEY (ability_key, tier, stat)
+);
+CREATE TABLE ability_upgrade_scales (
+    ability_key TEXT,
+    tier INTEGER,
+    stat TEXT,
+    position INTEGER,
+    value REAL,
+    type TEXT,
+    multiply INTEGER,
+    PRIMARY KEY (ability_key, tier, stat, position)
+);
+CREATE TABLE items (
+    key TEXT PRIMARY KEY,
+    name TEXT,
+    description TEXT,
+    cost INTEGER,
+    tier INTEGER,
+    slot TEXT,
+    activation TEXT,
+    is_disabled INTEGER,
+    street_brawl INTEGER,
+    is_imbue INTEGER,
+    data TEXT
+);
+CREATE TABLE item_stats (
+    item_key TEXT,
+    stat TEXT,
+    value,
+    scale_value REAL,
+    scale_type TEXT,
+    PRIMARY KEY (item_key, stat)
+);
+CREATE TABLE item_components (
+    item_key TEXT,
+    component_key TEXT,
+    PRIMARY KEY (item_key, component_key)
+);
+CREATE TABLE npcs (
+    key TEXT PRIMARY KEY,
+    name TEXT,
+    data TEXT
+);
+CREATE TABLE npc_stats (
+    npc_key TEXT,
+    stat TEXT,
+    value,
+    PRIMARY KEY (npc_key, stat)
+);
+CREATE TABLE localizations (
+    language TEXT,
+    key TEXT,
+    value TEXT,
+    PRIMARY KEY (language, key)
+) WITHOUT ROWID;
+CREATE TABLE convars (
+    name TEXT PRIMARY KEY,
+    value,
+    description TEXT
+);
+"""
+
+# Created once the data is inserted, which is faster than keeping them up to date on every insert
+INDEXES = [
+    'CREATE INDEX heroes_name ON heroes (name)',
+    'CREATE INDEX hero_abilities_ability ON hero_abilities (ability_key)',
+    'CREATE INDEX abilities_name ON abilities (name)',
+    'CREATE INDEX ability_stats_stat ON ability_stats (stat, value)',
+    'CREATE INDEX items_name ON items (name)',
+    'CREATE INDEX items_slot_tier ON items (slot, tier)',
+    'CREATE INDEX items_tier ON items (tier)',
+    'CREATE INDEX item_stats_stat ON item_stats (stat, value)',
+    'CREATE INDEX item_components_component ON item_components (component_key)',
+    'CREATE INDEX npcs_name ON npcs (name)',
+    'CREATE INDEX localizations_key ON localizations (key)',
+]
+
+
+def export_to_sqlite(OUTPUT_DIR, localization_deltas=False):
+    """
+    Export the parsed json data, localizations and convars to a single SQLite database, sqlite/deadlock-data.db,
+    so consumers can query it rather than loading whole json files.
+
+    The database is built in a single transaction in a temporary file, which then replaces the previous database.
+
+    Args:
+        localization_deltas (bool, optional): Whether the localizations of languages other than english only hold
+            the strings that differ from english, see LocalizationParser. These are resolved against english,
+            so the database holds every string of every language
+    """
+    path = f'{OUTPUT_DIR}/sqlite/deadlock-data.db'
+    temp_path = path + '.tmp'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    # transactions are managed explicitly, so every insert is made in one transaction
+    connection = sqlite3.connect(temp_path, isolation_level=None)
+    try:
+        # the database is only moved into place once it is complete, so there is nothing to recover from a crash
+        connection.execute('PRAGMA journal_mode = OFF')
+        connection.execute('PRAGMA synchronous = OFF')
+        connection.executescript(SCHEMA)
+
+        connection.execute('BEGIN')
+        _insert_heroes(connection, _read_output(OUTPUT_DIR, 'json/hero-data.json'))
+        _insert_abilities(connection, _read_output(OUTPUT_DIR, 'json/ability-data.json'))
+        _insert_items(connection, _read_output(OUTPUT_DIR, 'json/item-data.json'))
+        _insert_npcs(connection, _read_output(OUTPUT_DIR, 'json/npc-data.json'))
+        _insert_localizations(connection, OUTPUT_DIR, localization_deltas)
+        _insert_convars(connection, _read_output(OUTPUT_DIR, 'json/convars.json'))
+        for index in INDEXES:
+            connection.execute(index)
+        connection.execute('COMMIT')
+    finally:
+        connection.close()
+
+    os.replace(temp_path, path)
+
+
+def _read_output(OUTPUT_DIR, file_name):
+    data = json_utils.read(f'{OUTPUT_DIR}/{file_name}', ignore_error=True)
+    if data is None:
+        logger.trace(f'Missing {file_name}, so it is not exported to sqlite')
+        return {}
+    return data
+
+
+def _insert_heroes(connection, heroes):
+    connection.executemany(
+        'INSERT INTO heroes VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (
+            (
+                key,
+                hero.get('Name'),
+                hero.get('Type'),
+                hero.get('IsDisabled'),
+                hero.get('InDevelopment'),
+                hero.get('IsSelectable'),
+                _to_json(hero),
+            )
+            for key, hero in heroes.items()
+        ),
+    )
+    connection.executemany(
+        'INSERT INTO hero_stats VALUES (?, ?, ?)',
+        ((key, stat, value) for key, hero in heroes.items() for stat, value in _get_stats(hero, ['Name'])),
+    )
+    connection.executemany(
+        'INSERT INTO hero_abilities VALUES (?, ?, ?)',
+        (
+            (key, slot, ability.get('Key'))
+            for key, hero in heroes.items()
+            for slot, ability in (hero.get('BoundAbilities') or {}).items()
+            if isinstance(ability, dict)
+        ),
+    )
+
+
+def _insert_abilities(connection, abilities):
+    connection.executemany(
+        'INSERT INTO abilities VALUES (?, ?, ?, ?)',
+        ((key, ability.get('Name'), ability.get('IsDisabled'), _to_json(ability)) for key, ability in abilities.items()),
+    )
+
+    stats = []
+    scales = []
+    for key, ability in abilities.items():
+        for stat, value in ability.items():
+            if stat in ('Key', 'Name'):
+                continue
+            if _is_scaled(value):
+                stats.append((key, stat, _to_sql(value['Value'])))
+                scales.extend((key, stat, position, scale.get('Value'), scale.get('Type')) for position, scale in _get_scales(value))
+            elif not isinstance(value, (dict, list)):
+                stats.append((key, stat, _to_sql(value)))
+    connection.executemany('INSERT INTO ability_stats VALUES (?, ?, ?)', stats)
+    connection.executemany('INSERT INTO ability_scales VALUES (?, ?, ?, ?, ?)', scales)
+
+    upgrades = []
+    upgrade_scales = []
+    for key, ability in abilities.items():
+        # upgrades are bought in order, starting at tier 1
+        for tier, upgrade_set in enumerate(ability.get('Upgrades') or [], start=1):
+            for stat, upgrade in upgrade_set.items():
+                if not _is_scaled(upgrade):
+                    upgrades.append((key, tier, stat, _to_sql(upgrade), False))
+                    continue
+
+                upgrades.append((key, tier, stat, _to_sql(upgrade['Value']), upgrade.get('Multiply', False)))
+                upgrade_scales.extend(
+                    (key, tier, stat, position, scale.get('Value'), scale.get('Type'), scale.get('Multiply', False))
+                    for position, scale in _get_scales(upgrade)
+                )
+    connection.executemany('INSERT INTO ability_upgrades VALUES (?, ?, ?, ?, ?)', upgrades)
+    connection.executemany('INSERT INTO ability_upgrade_scales VALUES (?, ?, ?, ?, ?, ?, ?)', upgrade_scales)
+
+
+def _insert_items(connection, items):
+    connection.executemany(
+        'INSERT INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (
+            (
+                key,
+                item.get('Name'),
+                item.get('Description'),
+                item.get('Cost'),
+                item.get('Tier'),
+                item.get('Slot'),
+                item.get('Activation'),
+                item.get('IsDisabled'),
+                item.get('StreetBrawl'),
+                item.get('IsImbue'),
+                _to_json(item),
+            )
+            for key, item in items.items()
+        ),
+    )
+
+    stats = []
+    for key, item in items.items():
+        for stat, value in item.items():
+            if stat in ('Name', 'Description'):
+                continue
+            if _is_scaled(value):
+                # items only have a single scale per stat
+                scale = next((scale for _, scale in _get_scales(value)), {})
+                stats.append((key, stat, _to_sql(value['Value']), scale.get('Value'), scale.get('Type')))
+            elif not isinstance(value, (dict, list)):
+                stats.append((key, stat, _to_sql(value), None, None))
+    connection.executemany('INSERT INTO item_stats VALUES (?, ?, ?, ?, ?)', stats)
+
+    connection.executemany(
+        'INSERT OR IGNORE INTO item_components VALUES (?, ?)',
+        ((key, component) for key, item in items.items() for component in item.get('Components') or []),
+    )
+
+
+def _insert_npcs(connection, npcs):
+    connection.executemany(
+        'INSERT INTO npcs VALUES (?, ?, ?)',
+        ((key, npc.get('Name'), _to_json(npc)) for key, npc in npcs.items()),
+    )
+    connection.executemany(
+        'INSERT INTO npc_stats VALUES (?, ?, ?)',
+        ((key, stat, value) for key, npc in npcs.items() for stat, value in _get_stats(npc, ['Name'])),
+    )
+
+
+def _insert_localizations(connection, OUTPUT_DIR, deltas):
+    localizations_dir = f'{OUTPUT_DIR}/localizations'
+    if not os.path.isdir(localizations_dir):
+        return
+
+    english = None
+    if deltas:
+        english = json_utils.read(os.path.join(localizations_dir, 'english.json'), ignore_error=True)
+        if english is None:
+            logger.warning('Missing english localizations, so the localization deltas of other languages are exported as is')
+
+    for file_name in sorted(os.listdir(localizations_dir)):
+        if not file_name.endswith('.json'):
+            continue
+
+        language = file_name[: -len('.json')]
+        localization = json_utils.read(os.path.join(localizations_dir, file_name))
+        if english is not None and language != 'english':
+            # strings missing from a delta are the same as english
+            localization = {**english, **localization}
+        connection.executemany('INSERT INTO localizations VALUES (?, ?, ?)', ((language, key, value) for key, value in localization.items()))
+
+
+def _insert_convars(connection, convars):
+    # convars with a description are stored as {"value", "description"}, see ConvarsParser
+    connection.executemany(
+        'INSERT INTO convars VALUES (?, ?, ?)',
+        (
+            (name, _to_sql(convar['value']), convar.get('description')) if isinstance(convar, dict) else (name, _to_sql(convar), None)
+            for name, convar in convars.items()
+        ),
+    )
+
+
+def _get_stats(entity, excluded_keys):
+    """Yields the stats of an entity that are plain values, as anything nested is only kept in its json"""
+    for stat, value in entity.items():
+        if stat not in excluded_keys and not isinstance(value, (dict, list)):
+            yield stat, value
+
+
+def _is_scaled(value):
+    """Whether a stat is a value that scales with another stat, eg. {"Value": 10, "Scale": {"Value": 0.5, "Type": "spirit"}}"""
+    return isinstance(value, dict) and 'Value' in value and 'Scale' in value
+
+
+def _get_scales(value):
+    """Yields the position and scale of each of the scales of a scaled stat, of which there can be several"""
+    scales = value['Scale'] if isinstance(value['Scale'], list) else [value['Scale']]
+    return enumerate(scale for scale in scales if isinstance(scale, dict))
+
+
+def _to_sql(value):
+    """Convert a value sqlite cannot store, ie. a dict or list, to json"""
+    if isinstance(value, (dict, list)):
+        return _to_json(value)
+    return value
+
+
+def _to_json(value):
+    return json.dumps(value, ensure_ascii=False)
@@ -1,3 +1,4 @@
+import functools
 import sys
 import os
 import re
@@ -24,31 +25,96 @@ def format_description(description, *data_sets):
         "<span class=\"highlight\">+{s:AbilityCastRange}m</span> Cast Range and gain <span class=\"highlight\">+{s:WeaponDamageBonus}</span> Weapon Damage for {s:WeaponDamageBonusDuration}s"
     ->  "+7 Weapon Damage for 10s after teleporting with Flying Cloak"
     """  # noqa: E501
-    data = json_utils.CaseInsensitiveDict()
-    for data_set in data_sets:
-        data.update(data_set)
-
-    # a scaled attribute nests its number under 'Value', eg. {'Value': 6, 'Scale': {...}}.
-    # A description wants that number, with the scale offered separately as '<attr>_scale'
-    for key, value in list(data.items()):
-        if isinstance(value, dict) and 'Scale' in value:
-            data[key] = value['Value']
-
-            scale = value['Scale']
-            # if there are multiple scales, use the first one as it is usually the more relevant one - eg. spirit power
-            if isinstance(scale, list):
-                scale = scale[0]
-
-            data[f'{key}_scale'] = scale['Value']
-
     if isinstance(description, tuple):
         description = description[0]
 
     if description is None:
         return None
 
-    return _replace_variables(description, data)
+    return compile_description(description).render(DescriptionVariables(*data_sets))
+
+
+# Variables within a description, eg. "{s:LifeThreshold}", sometimes wrapped in square brackets
+VARIABLE_PATTERN = re.compile(r'\[?\{s:(.*?)\}\]?')
+
+
+@functools.cache
+def compile_description(description):
+    """
+    Compile a description into a DescriptionTemplate. The same localized strings are formatted
+    many times with different data, eg. for each hero sharing a description, the transformed copy of
+    a hero and Street Brawl, so templates are cached by their text, which also keeps them per language
+    """
+    return DescriptionTemplate(description)
+
+
+class DescriptionTemplate:
+    """
+    A description split into its literal text and the variables in between,
+    so it only needs to be searched for variables once
+
+    Example:
+        "When you are above {s:LifeThreshold}% health" -> ['When you are above ', '% health'], ['LifeThreshold']
+    """
+
+    __slots__ = ('literals', 'keys')
+
+    def __init__(self, description):
+        # splitting on a pattern with one group alternates between literal text and variable names
+        parts = VARIABLE_PATTERN.split(description)
+        self.literals = parts[0::2]
+        self.keys = [maps.override_localization(key) for key in parts[1::2]]
+
+    def render(self, data):
+        """
+        Args:
+            data (DescriptionVariables): source of the values to insert for each variable
+        """
+        if not self.keys:
+            return self.literals[0]
+
+        parts = [self.literals[0]]
+        for key, literal in zip(self.keys, self.literals[1:]):
+            parts.append(_format_variable(key, data))
+            parts.append(literal)
+        return ''.join(parts)
+
+
+class DescriptionVariables:
+    """
+    Resolves description variables from any number of data sets, with later data sets taking priority.
+    Each variable is looked up case-insensitively across the data sets as it is needed, rather than
+    merging them all up front, as one of them is usually the entire localization data.
+    """
 
+    def __init__(self, *data_sets):
+        self.data = json_utils.CaseInsensitiveChain(*data_sets)
+
+    def get(self, key, default=None):
+        # a scaled attribute nests its number under 'Value', eg. {'Value': 6, 'Scale': {...}}.
+        # A description wants that number, with the scale offered separately as '<attr>_scale'
+        if key.lower().endswith('_scale'):
+            value = self.data.get(key[: -len('_scale')])
+            if _is_scaled(value):
+                scale = value['Scale']
+                # if there are multiple scales, use the first one as it is usually the more relevant one - eg. spirit power
+                if isinstance(scale, list):
+                    scale = scale[0]
+
+                return scale['Value']
+
+        value = self.data.get(key, default)
+        if _is_scaled(value):
+            return value['Value']
+
+        return value
+
+
+def _is_scaled(value):
+    return isinstance(value, dict) and 'Scale' in value
+
+
+_MISSING = object()
 
 # Keys to ignore errors, as they are manually verified as having no valid override
 IGNORE_KEYS = [
@@ -64,35 +130,34 @@ IGNORE_KEYS = [
 ]
 
 
-# format description with data. eg. "When you are above {s:LifeThreshold}% health"
+# format a variable of a description with data. eg. "When you are above {s:LifeThreshold}% health"
 # should become "When you are above 20% health"
-def _replace_variables(desc, data):
-    def replace_match(match):
-        key = match.group(1)
-        key = maps.override_localization(key)
-        if key in data:
-            value = str(data[key])
+def _format_variable(key, data):
+    value = data.get(key, _MISSING)
+    if value is not _MISSING:
+        return _format_value(str(value))
 
-            # strip out units of measure to prevent duplicates eg. "Cooldown reduced by 5ss"
-            stripped_value = num_utils.remove_uom(value)
-            if type(stripped_value) in [float, int]:
-                if isinstance(stripped_value, float) and stripped_value.is_integer():
-                    return str(int(stripped_value))
+    if key in IGNORE_KEYS:
+        return f'IGNORED[{key}]'
 
-                return str(stripped_value)
+    logger.warning(f'Could not find variable for key {key}')
 
-            return value
+    # return f'UNKNOWN[{key}]'
+    raise Exception(f'Data not found for "{key}"')
 
-        if key in IGNORE_KEYS:
-            return f'IGNORED[{key}]'
 
-        logger.warning(f'Could not find variable for key {key}')
+# the same handful of values are inserted over and over, eg. durations and percentages
+@functools.lru_cache(maxsize=4096)
+def _format_value(value):
+    # strip out units of measure to prevent duplicates eg. "Cooldown reduced by 5ss"
+    stripped_value = num_utils.remove_uom(value)
+    if type(stripped_value) in [float, int]:
+        if isinstance(stripped_value, float) and stripped_value.is_integer():
+            return str(int(stripped_value))
 
-        # return f'UNKNOWN[{key}]'
-        raise Exception(f'Data not found for "{key}"')
+        return str(stripped_value)
 
-    formatted_desc = re.sub(r'\[?\{s:(.*?)\}\]?', replace_match, desc)
-    return formatted_desc
+    return value
 
 
 def remove_letters(input_string):
@@ -117,3 +182,55 @@ def remove_prefix(str, prefix):
         str = str.split(prefix)[1]
 
     return str
+
+
+class PrefixStripper:
+    """
+    Removes Hungarian notation prefixes from keys, eg. m_flAbilityCastRange -> AbilityCastRange.
+    Prefixes are tried in the given order and the first that can be removed is. The same key names
+    repeat throughout the data, so the result for each key is cached.
+
+    Args:
+        prefixes (list): Prefixes to try, in order
+        require_uppercase (bool): Only remove a prefix that is followed by an uppercase character,
+            see remove_prefix. Otherwise it is removed as long as something remains after it
+        cache_size (int): Number of keys to cache the result of
+    """
+
+    def __init__(self, prefixes, require_uppercase=True, cache_size=4096):
+        self.prefixes = list(prefixes)
+        self.require_uppercase = require_uppercase
+
+        # the prefixes a key could start with, by their first character, keeping their order
+        self._candidates = {}
+        for prefix in self.prefixes:
+            self._candidates.setdefault(prefix[:1], []).append(prefix)
+
+        self.strip = functools.lru_cache(maxsize=cache_size)(self.strip)
+
+    def strip(self, key):
+        """Returns the key without its prefix"""
+        for prefix in self._candidates.get(key[:1], ()):
+            if self.require_uppercase:
+                new_key = remove_prefix(key, prefix)
+                if new_key != key:
+                    return new_key
+            elif len(key) > len(prefix) and key.startswith(prefix):
+                return key[len(prefix) :]
+
+        return key
+
+    def transform(self, data, skip_key=None, rename_key=None, prune_empty=False, recurse_lists=True):
+        """
+        Remove the prefixes from the keys of every dictionary in data, see json_utils.transform_keys
+
+        Args:
+            rename_key (callable, optional): Applied to each key after its prefix is removed
+        """
+        if rename_key is None:
+            return json_utils.transform_keys(data, self.strip, skip_key, prune_empty, recurse_lists)
+
+        def clean_key(key):
+            return rename_key(self.strip(key))
+
+        return json_utils.transform_keys(data, clean_key, skip_key, prune_empty, recurse_lists)